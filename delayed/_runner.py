@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""The entry of the child workers spawned by `delayed.worker.SpawnedWorker`.
+
+Usage:
+    python -m delayed._runner <task_fd>
+"""
+
+import logging
+import os
+import sys
+
+from .logger import logger, setup_logger
+from .task import Task
+from .utils import read1
+
+
+def read_task_data(fd):
+    """Reads the task data until the task channel has been closed by the monitor.
+
+    Args:
+        fd (int): The read end of the task channel.
+
+    Returns:
+        bytes: The task data.
+    """
+    chunks = []
+    while True:
+        data = read1(fd)
+        if not data:
+            return b''.join(chunks)
+        chunks.append(data)
+
+
+def main(task_fd):
+    """Runs the task received from the task channel.
+    If the task cannot be received, it exits with a non-zero code, so that the monitor will requeue the task.
+    Otherwise it exits with 0, and the monitor will release the task.
+
+    Args:
+        task_fd (int): The read end of the task channel inherited from the monitor.
+    """
+    # the logging handlers of the worker are not inherited, only report the failures to stderr instead
+    setup_logger(level=logging.WARNING)
+
+    data = read_task_data(task_fd)
+    os.close(task_fd)
+    if not data:
+        logger.error('The task channel is broken.')
+        sys.exit(1)
+
+    try:
+        task = Task.deserialize(data)
+    except Exception:
+        logger.exception('Deserialize task failed.')
+        return
+
+    try:
+        task.run()
+    except Exception:
+        logger.exception('Run task %d failed.', task.id)
+        if task.error_handler_path:
+            task.handle_error(None, sys.exc_info())
+    except SystemExit as e:
+        if e.code:
+            if task.error_handler_path:
+                task.handle_error(None, sys.exc_info())
+        # the task is considered as finished whatever the exit code is
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]))
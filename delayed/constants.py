@@ -10,6 +10,7 @@ class Status(object):
 
 
 BUF_SIZE = 65536  # Same as the default pipe capacity of Linux and macOS.
+SMALL_BUF_SIZE = 64  # Enough for reading signal numbers and task results without allocating BUF_SIZE bytes.
 SIGNAL_MASK = 0xff
 SEP = ':'
 MAX_SLEEP_COUNT = 7
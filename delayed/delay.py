@@ -1,8 +1,49 @@
 # -*- coding: utf-8 -*-
 
+import inspect
+
 from .task import Task
 
 
+_DELAY_TEMPLATE = '''def _delay({params}):
+    enqueue(create(({args}), None))'''
+_RESERVED_NAMES = frozenset(('enqueue', 'create'))
+
+
+def _make_delay(func, enqueue, create):
+    """Makes the `delay()` function of a task function.
+    If all the params of the task function are positional-or-keyword params without default values,
+    a function with the same params is generated, so that it needn't pack the args into `*args` and `**kwargs`.
+    Otherwise it falls back to a function accepts `*args` and `**kwargs`.
+    The signature of the wrapped function is not followed, since the wrapper may accept different params.
+
+    Args:
+        func (callable): The task function.
+        enqueue (callable): The function to enqueue a task.
+        create (callable): The function to create a task by its `args` and `kwargs`.
+
+    Returns:
+        callable: The `delay()` function.
+    """
+    try:
+        params = list(inspect.signature(func, follow_wrapped=False).parameters.values())
+    except (AttributeError, TypeError, ValueError):  # Python 2, 3.4 or the signature is not available
+        params = None
+
+    if params is not None and _RESERVED_NAMES.isdisjoint(param.name for param in params) and all(
+        param.kind == param.POSITIONAL_OR_KEYWORD and param.default is param.empty for param in params
+    ):
+        names = [param.name for param in params]
+        source = _DELAY_TEMPLATE.format(params=', '.join(names), args=''.join(name + ', ' for name in names))
+        namespace = {'enqueue': enqueue, 'create': create}
+        exec(source, namespace)
+        return namespace['_delay']
+
+    def _delay(*args, **kwargs):
+        enqueue(create(args, kwargs))
+    return _delay
+
+
 def delayed(queue):
     """A decorator for defining task functions.
 
@@ -12,13 +53,18 @@ def delayed(queue):
     Returns:
         callable: A decorator.
     """
+    enqueue = queue.enqueue
+    enqueue_many = queue.enqueue_many
+
     def outer(timeout=None, prior=False, error_handler=None):
         def wrapper(func):
-            def _delay(*args, **kwargs):
-                task = Task.create(func, args, kwargs, timeout, prior, error_handler)
-                queue.enqueue(task)
+            create = Task.factory(func, timeout, prior, error_handler)
+
+            def _delay_many(args_list):
+                enqueue_many([create(args, None) for args in args_list])
 
-            func.delay = _delay
+            func.delay = _make_delay(func, enqueue, create)
+            func.delay_many = _delay_many
             return func
         return wrapper
     return outer
@@ -33,11 +79,10 @@ def delay(queue):
     Returns:
         callable: A decorator.
     """
+    enqueue = queue.enqueue
+
     def wrapper(func):
-        def _delay(*args, **kwargs):
-            task = Task.create(func, args, kwargs)
-            queue.enqueue(task)
-        return _delay
+        return _make_delay(func, enqueue, Task.factory(func))
     return wrapper
 
 
@@ -50,11 +95,10 @@ def delay_with_params(queue):
     Returns:
         callable: A decorator.
     """
+    enqueue = queue.enqueue
+
     def outer(timeout=None, prior=False, error_handler=None):
         def wrapper(func):
-            def _delay(*args, **kwargs):
-                task = Task.create(func, args, kwargs, timeout, prior, error_handler)
-                queue.enqueue(task)
-            return _delay
+            return _make_delay(func, enqueue, Task.factory(func, timeout, prior, error_handler))
         return wrapper
     return outer
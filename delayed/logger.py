@@ -9,6 +9,20 @@ logger.propagate = False
 _null_handler = logging.NullHandler()
 logger.addHandler(_null_handler)
 
+DEBUG_ENABLED = False  # Whether the debug logs would be emitted, the hot paths check it before logging.
+
+
+def refresh_debug_flag():
+    """Refreshes `DEBUG_ENABLED` according to the level and handlers of the logger.
+    It should be called after changing them without `set_handler()` or `setup_logger()`.
+    """
+    global DEBUG_ENABLED
+
+    DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG) and any(
+        handler.level <= logging.DEBUG and not isinstance(handler, logging.NullHandler)
+        for handler in logger.handlers
+    )
+
 
 def set_handler(handler):
     """Set the handler of the logger.
@@ -17,33 +31,37 @@ def set_handler(handler):
         handler (logging.Handler): The handler to be set.
     """
     logger.handlers = [handler]
+    refresh_debug_flag()
 
 
-def setup_logger(date_format=DEFAULT_DATE_FORMAT, log_format=DEFAULT_LOG_FORMAT):
+def setup_logger(date_format=DEFAULT_DATE_FORMAT, log_format=DEFAULT_LOG_FORMAT, level=logging.DEBUG):
     """Setup a console logger.
 
     Args:
         date_format (str): The date format of the logger.
         log_format (str): The log format of the logger.
+        level (int): The level of the handlers.
     """
     logger.removeHandler(_null_handler)
     if logger.handlers:
         for handler in logger.handlers:
-            _setup_handler(handler, date_format, log_format)
+            _setup_handler(handler, date_format, log_format, level)
     else:
         handler = logging.StreamHandler()
-        _setup_handler(handler, date_format, log_format)
+        _setup_handler(handler, date_format, log_format, level)
         logger.addHandler(handler)
+    refresh_debug_flag()
 
 
-def _setup_handler(handler, date_format, log_format):
+def _setup_handler(handler, date_format, log_format, level=logging.DEBUG):
     """Setup a handler for the logger.
 
     Args:
         handler (logging.Handler): The handler to be setup.
         date_format (str): The date format of the handler.
         log_format (str): The log format of the handler.
+        level (int): The level of the handler.
     """
-    handler.setLevel(logging.DEBUG)
+    handler.setLevel(level)
     formatter = logging.Formatter(fmt=log_format, datefmt=date_format)
     handler.setFormatter(formatter)
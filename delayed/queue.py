@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from . import logger as log
 from .logger import logger
 from .task import Task
 from .utils import current_timestamp
@@ -15,6 +16,29 @@ local timeout = redis.call('zscore', KEYS[2], task)
 redis.call('zadd', KEYS[3], tonumber(ARGV[1]) + timeout, task)
 return task'''
 
+# KEYS: queue_name, noti_key, enqueued_key, dequeued_key
+# ARGV: current_timestamp, count, popped_noti_count
+# The tasks will be run one by one, so their timeouts are accumulated.
+_DEQUEUE_BATCH_SCRIPT = '''local count = tonumber(ARGV[2])
+for i=tonumber(ARGV[3])+1,count do
+    if not redis.call('lpop', KEYS[2]) then
+        count = i - 1
+        break
+    end
+end
+local tasks = {}
+local deadline = tonumber(ARGV[1])
+for i=1,count do
+    local task = redis.call('lpop', KEYS[1])
+    if not task then
+        break
+    end
+    deadline = deadline + redis.call('zscore', KEYS[3], task)
+    redis.call('zadd', KEYS[4], deadline, task)
+    table.insert(tasks, task)
+end
+return tasks'''
+
 # KEYS: queue_name, noti_key, enqueued_key, dequeued_key
 # ARGV: task_data, timeout, prior
 _REQUEUE_SCRIPT = '''local deleted = redis.call('zrem', KEYS[4], ARGV[1])
@@ -110,6 +134,7 @@ class Queue(object):
         self._requeue_timeout = requeue_timeout * 1000
         self._busy_len = busy_len
         self._dequeue_script = conn.register_script(_DEQUEUE_SCRIPT)
+        self._dequeue_batch_script = conn.register_script(_DEQUEUE_BATCH_SCRIPT)
         self._requeue_script = conn.register_script(_REQUEUE_SCRIPT)
         self._requeue_lost_script = conn.register_script(_REQUEUE_LOST_SCRIPT)
 
@@ -121,7 +146,8 @@ class Queue(object):
         """
         if task.id is None:
             task.id = self._conn.incr(self._id_key)
-        logger.debug('Enqueuing task %d.', task.id)
+        if log.DEBUG_ENABLED:
+            logger.debug('Enqueuing task %d.', task.id)
         data = task.serialize()
         with self._conn.pipeline() as pipe:
             if task.prior:
@@ -131,24 +157,98 @@ class Queue(object):
             pipe.rpush(self._noti_key, '1')
             pipe.zadd(self._enqueued_key, {data: (task.timeout or self.default_timeout) + self._requeue_timeout})
             pipe.execute()
-        logger.debug('Enqueued task %d', task.id)
+        if log.DEBUG_ENABLED:
+            logger.debug('Enqueued task %d', task.id)
+
+    def enqueue_many(self, tasks):
+        """Enqueues tasks to the queue.
+        It's faster than calling `enqueue()` for each task, because all the tasks are sent in one round trip.
+
+        Args:
+            tasks (list(delayed.task.Task)): The tasks to be enqueued.
+        """
+        if not tasks:
+            return
+
+        count = 0
+        for task in tasks:
+            if task.id is None:
+                count += 1
+        if count:
+            task_id = self._conn.incrby(self._id_key, count) - count
+            for task in tasks:
+                if task.id is None:
+                    task_id += 1
+                    task.id = task_id
+
+        if log.DEBUG_ENABLED:
+            logger.debug('Enqueuing %d tasks.', len(tasks))
+        timeouts = {}
+        with self._conn.pipeline() as pipe:
+            for task in tasks:
+                data = task.serialize()
+                if task.prior:
+                    pipe.lpush(self._name, data)
+                else:
+                    pipe.rpush(self._name, data)
+                timeouts[data] = (task.timeout or self.default_timeout) + self._requeue_timeout
+            pipe.rpush(self._noti_key, *(['1'] * len(tasks)))
+            pipe.zadd(self._enqueued_key, timeouts)
+            pipe.execute()
+        if log.DEBUG_ENABLED:
+            logger.debug('Enqueued %d tasks.', len(tasks))
 
-    def dequeue(self):
+    def dequeue(self, block=True):
         """Dequeues a task from the queue.
 
+        Args:
+            block (bool): Whether to wait for at most 1 second if the queue is empty.
+
         Returns:
             delayed.task.Task or None: The dequeued task, or None if the queue is empty.
         """
-        if self._conn.blpop(self._noti_key, 1):
-            logger.debug('Popped a task.')
+        if block:
+            noti = self._conn.blpop(self._noti_key, 1)
+        else:
+            noti = self._conn.lpop(self._noti_key)
+        if noti:
+            if log.DEBUG_ENABLED:
+                logger.debug('Popped a task.')
             data = self._dequeue_script(
                 keys=(self._name, self._enqueued_key, self._dequeued_key),
                 args=(current_timestamp(),))
             if data:
                 task = Task.deserialize(data)
-                logger.debug('Dequeued task %d.', task.id)
+                if log.DEBUG_ENABLED:
+                    logger.debug('Dequeued task %d.', task.id)
                 return task
 
+    def dequeue_batch(self, count, block=True):
+        """Dequeues at most `count` tasks from the queue in one round trip.
+        The tasks are supposed to be run one by one, so each task is marked as dequeued until the sum of
+        the timeouts of the tasks before it (including itself) has passed.
+
+        Args:
+            count (int): The max count of the tasks to be dequeued.
+            block (bool): Whether to wait for at most 1 second if the queue is empty.
+
+        Returns:
+            list(delayed.task.Task): The dequeued tasks. It's empty if the queue is empty.
+        """
+        if block:
+            if not self._conn.blpop(self._noti_key, 1):
+                return []
+            popped_noti_count = 1
+        else:
+            popped_noti_count = 0
+        data_list = self._dequeue_batch_script(
+            keys=(self._name, self._noti_key, self._enqueued_key, self._dequeued_key),
+            args=(current_timestamp(), count, popped_noti_count))
+        tasks = [Task.deserialize(data) for data in data_list]
+        if log.DEBUG_ENABLED:
+            logger.debug('Dequeued %d tasks.', len(tasks))
+        return tasks
+
     def requeue(self, task):
         """Enqueues a dequeued task back to the queue.
 
@@ -158,9 +258,9 @@ class Queue(object):
         Returns:
             bool: Whether the task has been requeued.
         """
-        data = task.data
-        if not data:
+        if not task.data:
             return False
+        data = task.serialize()
         logger.debug('Requeuing task %d.', task.id)
         requeued = self._requeue_script(
             keys=(self._name, self._noti_key, self._enqueued_key, self._dequeued_key),
@@ -178,12 +278,15 @@ class Queue(object):
         Args:
             task (delayed.task.Task): The task to be release.
         """
-        logger.debug('Releasing task %d.', task.id)
+        if log.DEBUG_ENABLED:
+            logger.debug('Releasing task %d.', task.id)
+        data = task.serialize()
         with self._conn.pipeline() as pipe:
-            pipe.zrem(self._enqueued_key, task.data)
-            pipe.zrem(self._dequeued_key, task.data)
+            pipe.zrem(self._enqueued_key, data)
+            pipe.zrem(self._dequeued_key, data)
             pipe.execute()
-        logger.debug('Released task %d.', task.id)
+        if log.DEBUG_ENABLED:
+            logger.debug('Released task %d.', task.id)
 
     def len(self):
         """Returns the length of the queue."""
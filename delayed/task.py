@@ -7,17 +7,59 @@ except ImportError:  # pragma: no cover
 from importlib import import_module
 
 from .constants import SEP
+from . import logger as log
 from .logger import logger
 
 
 PICKLE_PROTOCOL_VERSION = pickle.HIGHEST_PROTOCOL
-loads = pickle.loads
+
+if bytes is str:  # pragma: no cover
+    def loads(data):
+        # cPickle.loads() only accepts str
+        if not isinstance(data, bytes):
+            data = memoryview(data).tobytes()
+        return pickle.loads(data)
+else:
+    loads = pickle.loads  # it accepts any bytes-like object
 
 
 def dumps(obj):
     return pickle.dumps(obj, PICKLE_PROTOCOL_VERSION)
 
 
+def get_func_path(func):
+    """Gets the path of a function.
+
+    Args:
+        func (callable): The function defined in module level.
+
+    Returns:
+        str: The function path in the format of "module_path:func_name".
+    """
+    return func.__module__ + SEP + func.__name__
+
+
+def _get_task_params(func, timeout, error_handler):
+    """Gets the params of a task which are computed from the params of `Task.create()`.
+
+    Args:
+        func (callable): The task function.
+        timeout (int or float): The timeout in seconds of the task.
+        error_handler (callable): The error handler.
+
+    Returns:
+        (str, int or float or None, str or None): The function path, the timeout in milliseconds,
+            and the error handler path of the task.
+    """
+    if timeout:
+        timeout = timeout * 1000
+    if error_handler:
+        error_handler_path = get_func_path(error_handler)
+    else:
+        error_handler_path = None
+    return get_func_path(func), timeout, error_handler_path
+
+
 def set_pickle_protocol_version(version):
     """Set pickle protocol version for serializing and deserializing tasks.
     The default version is pickle.HIGHEST_PROTOCOL.
@@ -107,6 +149,10 @@ class Task(object):
 
     @property
     def data(self):
+        """bytes or memoryview or None: The serialized data of the task.
+        It's a memoryview if the task was received by the child of a `PreforkedWorker`,
+        use `task.serialize()` if bytes is needed (eg: in the error handler).
+        """
         return self._data
 
     @classmethod
@@ -128,16 +174,35 @@ class Task(object):
         Returns:
             Task: The created task.
         """
-        if timeout:
-            timeout = timeout * 1000
-        if error_handler:
-            error_handler_path = error_handler.__module__ + SEP + error_handler.__name__
-        else:
-            error_handler_path = None
-        return cls(None, func.__module__ + SEP + func.__name__, args, kwargs, timeout, prior, error_handler_path)
+        func_path, timeout, error_handler_path = _get_task_params(func, timeout, error_handler)
+        return cls(None, func_path, args, kwargs, timeout, prior, error_handler_path)
+
+    @classmethod
+    def factory(cls, func, timeout=None, prior=False, error_handler=None):
+        """Create a task factory of a task function.
+        The params of the tasks are computed only once, so it's faster than calling `Task.create()` for each task.
+
+        Args:
+            func (callable): The task function.
+                It should be defined in module level (except the `__main__` module).
+            timeout (int or float): The timeout in seconds of the tasks.
+            prior (bool): A prior task will be inserted at the first position.
+            error_handler (callable): The error handler.
+                If it's not empty, it will be called after the task failed.
+
+        Returns:
+            callable: A function which creates a task by its `args` and `kwargs`.
+        """
+        func_path, timeout, error_handler_path = _get_task_params(func, timeout, error_handler)
+
+        def create(args, kwargs):
+            return cls(None, func_path, args, kwargs, timeout, prior, error_handler_path)
+        return create
 
     def serialize(self):
         """Serializes the task to a string.
+        If the task was deserialized from a memoryview, it's converted to bytes, since the memoryview may be
+        writable and can't be hashed, and older versions of redis-py can't encode memoryview.
 
         Returns:
             str: The serialized data.
@@ -159,14 +224,17 @@ class Task(object):
             if i < 0:
                 data = data[:i]
             self._data = dumps(data)
+        elif isinstance(self._data, memoryview):  # received by the child of a PreforkedWorker
+            self._data = self._data.tobytes()
         return self._data
 
     @classmethod
     def deserialize(cls, data):
         """Deserialize a task from a string.
+        The data can be any bytes-like object (eg: a memoryview of a received buffer), it won't be copied.
 
         Args:
-            data (str): The string to be deserialize.
+            data (bytes or memoryview): The data to be deserialize.
 
         Returns:
             Task: The deserialized task.
@@ -181,7 +249,8 @@ class Task(object):
         Returns:
             Any: The result of the task function.
         """
-        logger.debug('Running task %d.', self.id)
+        if log.DEBUG_ENABLED:
+            logger.debug('Running task %d.', self.id)
         module_path, func_name = self._func_path.split(SEP, 1)
         module = import_module(module_path)
         func = getattr(module, func_name)
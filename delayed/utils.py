@@ -7,7 +7,10 @@ import random
 import select
 import time
 
-from .constants import BUF_SIZE, MAX_SLEEP_COUNT, MIN_SLEEP_TIME
+from .constants import BUF_SIZE, MAX_SLEEP_COUNT, MIN_SLEEP_TIME, SMALL_BUF_SIZE
+
+EVENT_READ = 0x001  # the same as select.EPOLLIN
+EVENT_WRITE = 0x004  # the same as select.EPOLLOUT
 
 
 def ignore_signal(signum, frame):
@@ -25,6 +28,90 @@ def select_ignore_eintr(rlist, wlist, xlist, timeout=None):
                 raise
 
 
+if hasattr(select, 'epoll'):
+    class Poller(object):
+        """Poller waits for I/O events of the registered file descriptions.
+        It uses epoll, so the file descriptions won't be copied into the kernel for each poll.
+        """
+
+        __slots__ = ['_epoll']
+
+        def __init__(self):
+            self._epoll = select.epoll()
+
+        def register(self, fd, events=EVENT_READ):
+            """Registers a file description.
+
+            Args:
+                fd (int): The file description to be registered.
+                events (int): The events to wait for, EVENT_READ or EVENT_WRITE.
+            """
+            self._epoll.register(fd, events)
+
+        def unregister(self, fd):
+            """Unregisters a file description.
+
+            Args:
+                fd (int): The file description to be unregistered.
+            """
+            self._epoll.unregister(fd)
+
+        def poll(self, timeout=None):
+            """Waits for I/O events and ignores EINTR.
+
+            Args:
+                timeout (int or float or None): The timeout in seconds. None means no timeout.
+
+            Returns:
+                list((int, int)): The ready file descriptions with their events.
+            """
+            if timeout is None:
+                timeout = -1
+            while True:
+                try:
+                    return self._epoll.poll(timeout)
+                except (IOError, OSError) as e:  # pragma: no cover
+                    if e.errno != errno.EINTR:
+                        raise
+
+        def close(self):
+            """Closes the poller."""
+            self._epoll.close()
+else:  # pragma: no cover
+    class Poller(object):
+        """Poller waits for I/O events of the registered file descriptions.
+        It falls back to select if epoll is not available.
+        """
+
+        __slots__ = ['_rlist', '_wlist']
+
+        def __init__(self):
+            self._rlist = []
+            self._wlist = []
+
+        def register(self, fd, events=EVENT_READ):
+            if events & EVENT_READ:
+                self._rlist.append(fd)
+            if events & EVENT_WRITE:
+                self._wlist.append(fd)
+
+        def unregister(self, fd):
+            if fd in self._rlist:
+                self._rlist.remove(fd)
+            if fd in self._wlist:
+                self._wlist.remove(fd)
+
+        def poll(self, timeout=None):
+            readable_fds, writable_fds, _ = select_ignore_eintr(self._rlist, self._wlist, (), timeout)
+            events = [(fd, EVENT_READ) for fd in readable_fds]
+            events.extend((fd, EVENT_WRITE) for fd in writable_fds)
+            return events
+
+        def close(self):
+            self._rlist = []
+            self._wlist = []
+
+
 def wait_pid_ignore_eintr(pid, options):
     """It calls os.waitpid() and ignores EINTR."""
     while True:
@@ -45,34 +132,82 @@ def set_non_blocking(fd):
     fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
 
 
-def non_blocking_pipe():
-    """Creates a non-blocking pipe.
+def set_close_on_exec(fd):
+    """Sets a file description as close-on-exec, so that it won't be leaked to the executed programs.
 
-    Returns:
-        (int, int): The non-blocking pipe.
+    Args:
+        fd (int): The file description to be set.
     """
-    r, w = os.pipe()
-    set_non_blocking(r)
-    set_non_blocking(w)
-    return r, w
-
+    flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+    fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+
+if hasattr(os, 'pipe2'):
+    def non_blocking_pipe():
+        """Creates a non-blocking and close-on-exec pipe.
+        The forked child workers still inherit it, but the programs executed by the tasks won't.
+
+        Returns:
+            (int, int): The non-blocking pipe.
+        """
+        return os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+else:  # pragma: no cover
+    def non_blocking_pipe():
+        """Creates a non-blocking and close-on-exec pipe.
+        It sets the flags by fcntl() since os.pipe2() is not available.
+
+        Returns:
+            (int, int): The non-blocking pipe.
+        """
+        r, w = os.pipe()
+        for fd in (r, w):
+            set_non_blocking(fd)
+            set_close_on_exec(fd)
+        return r, w
+
+
+def close_fds(fds):
+    """Closes the file descriptions.
+    The consecutive ones (eg: the 2 ends of a pipe) are closed by one os.closerange() call.
 
-def drain_out(fd):
+    Args:
+        fds (iterable(int)): The file descriptions to be closed.
+    """
+    fds = sorted(fds)
+    count = len(fds)
+    i = 0
+    while i < count:
+        low = high = fds[i]
+        i += 1
+        while i < count and fds[i] == high + 1:
+            high += 1
+            i += 1
+        if low == high:
+            os.close(low)
+        else:
+            os.closerange(low, high + 1)
+
+
+def drain_out(fd, length=None):
     """Reads all the data from the file description.
 
     Args:
         fd (int): The file description to be read.
+        length (int or None): The read buffer size. None means BUF_SIZE.
+            A small size should be used if little data is expected.
 
     Returns:
         bool: Whether any data has been read from the file description.
     """
+    if length is None:
+        length = BUF_SIZE
     has_read = False
     while True:
         try:
-            data = os.read(fd, BUF_SIZE)
+            data = os.read(fd, length)
             if data:
                 has_read = True
-                if len(data) < BUF_SIZE:
+                if len(data) < length:
                     return has_read
             else:
                 return has_read
@@ -82,6 +217,32 @@ def drain_out(fd):
             return has_read
 
 
+def drain_signals(fd):
+    """Reads all the signal numbers from the wakeup fd set by signal.set_wakeup_fd().
+    Python 3.5+ writes the number of each caught signal to the fd, earlier versions always write 0.
+
+    Args:
+        fd (int): The wakeup fd to be read.
+
+    Returns:
+        set(int): The caught signal numbers. 0 means an unknown signal.
+    """
+    signums = set()
+    while True:
+        try:
+            data = os.read(fd, SMALL_BUF_SIZE)
+            if data:
+                signums.update(bytearray(data))
+                if len(data) < SMALL_BUF_SIZE:
+                    return signums
+            else:  # pragma: no cover
+                return signums
+        except OSError as e:  # pragma: no cover
+            if e.errno == errno.EINTR:
+                continue
+            return signums
+
+
 def read1(fd, length=BUF_SIZE):
     """Reads data from the file description with at most one call to the underlying os.read().
 
@@ -102,32 +263,43 @@ def read1(fd, length=BUF_SIZE):
                 return b''
 
 
-def read_bytes(fd, length, buf):
-    """Reads data from the file description into a buffer.
+if hasattr(os, 'readv'):
+    def _read_into(fd, buf):
+        return os.readv(fd, (buf,))
+else:  # pragma: no cover
+    def _read_into(fd, buf):
+        data = os.read(fd, len(buf))
+        length = len(data)
+        buf[:length] = data
+        return length
+
+
+def read_into(fd, buf):
+    """Reads data from the file description into a buffer, until the buffer is full or no more data
+    can be read.
 
     Args:
         fd (int): The file description to be read.
-        length (int): The data length to be read.
-        buf (io.BytesIO): The read buffer.
+        buf (memoryview): The writable buffer.
 
     Returns:
-        int: The rest data length.
+        int: The read length.
     """
-    while True:
+    buf_length = len(buf)
+    read_length = 0
+    while read_length < buf_length:
         try:
-            data = os.read(fd, length)
-            if data:
-                buf.write(data)
-                length -= len(data)
-                if length == 0:
-                    return length
-            else:
-                return length
+            length = _read_into(fd, buf[read_length:])
         except OSError as e:  # pragma: no cover
             if e.errno == errno.EINTR:
                 continue
             if e.errno == errno.EAGAIN:
-                return length
+                break
+            raise
+        if length == 0:
+            break
+        read_length += length
+    return read_length
 
 
 def try_write(fd, data):
@@ -153,6 +325,54 @@ def try_write(fd, data):
     return data, 0
 
 
+if hasattr(os, 'writev'):
+    def try_writev(fd, buffers):
+        """Tries to writes all the buffers to the file description with a scatter-gather write,
+        so that the buffers needn't be concatenated.
+        If the fd is blocking, it may be blocked if the write buffer is full.
+        If the fd is non-blocking, it returns the rest buffers that cannot be written.
+
+        Args:
+            fd (int): The file description to be write to.
+            buffers (list(bytes or bytearray or memoryview)): The buffers to be write.
+
+        Returns:
+            (list(memoryview), int): The rest buffers that cannot be written and the error number.
+        """
+        buffers = [memoryview(buf) for buf in buffers]
+        while buffers:
+            try:
+                length = os.writev(fd, buffers)
+            except OSError as e:
+                if e.errno == errno.EINTR:  # pragma: no cover
+                    continue
+                return buffers, e.errno
+            while length:
+                buf_length = len(buffers[0])
+                if length < buf_length:
+                    buffers[0] = buffers[0][length:]
+                    break
+                length -= buf_length
+                del buffers[0]
+            while buffers and not buffers[0]:  # skip empty buffers
+                del buffers[0]
+        return buffers, 0
+else:  # pragma: no cover
+    def try_writev(fd, buffers):
+        """Tries to writes all the buffers to the file description.
+        It concatenates the buffers since os.writev() is not available.
+
+        Args:
+            fd (int): The file description to be write to.
+            buffers (list(bytes or bytearray or memoryview)): The buffers to be write.
+
+        Returns:
+            (list(bytes), int): The rest buffers that cannot be written and the error number.
+        """
+        data, error_no = try_write(fd, b''.join(bytes(buf) for buf in buffers))
+        return [data] if data else [], error_no
+
+
 def write_byte(fd, data):
     """Writes a byte to the file description and ignores EPIPE.
     It may be blocked if the write buffer is full.
@@ -174,6 +394,20 @@ def write_byte(fd, data):
                 return 0
 
 
+if hasattr(time, 'monotonic_ns'):
+    monotonic_ns = time.monotonic_ns
+else:  # pragma: no cover
+    _monotonic = getattr(time, 'monotonic', time.time)
+
+    def monotonic_ns():
+        """Gets the value in nanoseconds of a monotonic clock if possible.
+
+        Returns:
+            int: The value of the clock.
+        """
+        return int(_monotonic() * 1000000000)
+
+
 def current_timestamp():
     """Gets the current timestamp in millisecond.
 
@@ -1,19 +1,96 @@
 # -*- coding: utf-8 -*-
 
+from collections import deque
 import errno
 import gc
-from io import BytesIO
+import multiprocessing
 import os
 import signal
 import struct
 import sys
+import threading
 import time
 
+from . import logger as log
 from .logger import logger
-from .constants import BUF_SIZE, SIGNAL_MASK, Status
+from .constants import BUF_SIZE, SIGNAL_MASK, SMALL_BUF_SIZE, Status
 from .task import Task
-from .utils import (drain_out, ignore_signal, non_blocking_pipe, read1, read_bytes, retry_time,
-                    select_ignore_eintr, try_write, wait_pid_ignore_eintr, write_byte)
+from .utils import (close_fds, drain_out, drain_signals, EVENT_WRITE, ignore_signal, monotonic_ns, non_blocking_pipe,
+                    Poller, read1, read_into, retry_time, select_ignore_eintr, set_non_blocking, try_write,
+                    try_writev, wait_pid_ignore_eintr, write_byte)
+
+_CHILD_SIGNALS = frozenset((signal.SIGCHLD, 0))  # 0 means an unknown signal before Python 3.5
+_HAS_FORK_HOOKS = hasattr(os, 'register_at_fork')  # Python 3.7+
+_HAS_GC_FREEZE = hasattr(gc, 'freeze')  # Python 3.7+
+_HAS_POSIX_SPAWN = hasattr(os, 'posix_spawn')  # Python 3.8+
+_MIN_POLL_TIMEOUT = 0.001  # avoids busy looping
+_MAX_POLL_TIMEOUT = 0.1
+_DEQUEUE_TIMEOUT_NS = 1000000000  # the time in nanoseconds that a blocking dequeue() may wait
+
+# Several threads may fork at the same time, only the first one records the state of gc,
+# and the last one restores it.
+_fork_lock = threading.Lock()
+_fork_count = 0  # the count of the forks in progress
+_gc_enabled_before_fork = False
+
+
+def _disable_gc_before_fork():
+    """Disables gc before forking: https://bugs.python.org/issue1336
+    It records whether gc was enabled, so that the state can be restored after forking.
+    """
+    global _fork_count, _gc_enabled_before_fork
+
+    with _fork_lock:
+        if _fork_count == 0:
+            _gc_enabled_before_fork = gc.isenabled()
+            gc.disable()
+        _fork_count += 1
+
+
+def _restore_gc_after_fork_in_parent():
+    """Restores the state of gc after forking if no other thread is forking.
+    It won't enable gc if it was disabled on purpose before forking.
+    """
+    global _fork_count
+
+    with _fork_lock:
+        _fork_count -= 1
+        if _fork_count == 0 and _gc_enabled_before_fork:
+            gc.enable()
+
+
+def _restore_gc_after_fork_in_child():
+    """Restores the state of gc in the child process.
+    Only the forking thread exists in the child process, so the lock and the count are reset,
+    since they may be held by the other threads of the parent process.
+    """
+    global _fork_lock, _fork_count
+
+    _fork_lock = threading.Lock()
+    _fork_count = 0
+    if _gc_enabled_before_fork:
+        gc.enable()
+
+
+def _get_poll_timeout(now, deadline, kill_deadline, killing):
+    """Gets the timeout of the next poll, so that the monitor can wake up in time to kill the child worker.
+
+    Args:
+        now (int): The current time in nanoseconds.
+        deadline (int): The deadline in nanoseconds of the task.
+        kill_deadline (int): The deadline in nanoseconds to kill the child worker.
+        killing (bool): Whether SIGTERM has been sent to the child worker.
+
+    Returns:
+        float: The timeout in seconds.
+    """
+    if not killing:
+        remaining = deadline - now
+    elif now < kill_deadline:
+        remaining = kill_deadline - now
+    else:  # SIGKILL has been sent
+        return _MAX_POLL_TIMEOUT
+    return min(max(remaining / 1000000000.0, _MIN_POLL_TIMEOUT), _MAX_POLL_TIMEOUT)
 
 
 class Worker(object):
@@ -21,21 +98,39 @@ class Worker(object):
 
     Args:
         queue (delayed.queue.Queue): The task queue of the worker.
+            Its `default_timeout` is read once when the worker is created.
         kill_timeout (int or float): The kill timeout in seconds of the worker.
             If a task runs out of time, the monitor will send SIGTERM signal to the worker.
             If the worker not exited in `kill_timeout` seconds, the monitor will send SIGKILL
             signal then.
+        batch_size (int): The max count of the tasks to be dequeued in one round trip.
+            The prefetched tasks are kept in memory until they are run, and will be requeued
+            when the worker stops. A large batch size may delay the tasks if some tasks are slow.
         success_handler (callable): The success callback.
         error_handler (callable): The error callback.
     """
 
-    __slots__ = ['_queue', '_kill_timeout', '_status']
+    __slots__ = ['_queue', '_default_timeout_ns', '_kill_timeout_ns', '_batch_size', '_prefetched_tasks', '_status']
+
+    _fork_hooks_registered = False
 
-    def __init__(self, queue, kill_timeout=5):
+    def __init__(self, queue, kill_timeout=5, batch_size=1):
         self._queue = queue
-        self._kill_timeout = kill_timeout
+        self._default_timeout_ns = int(queue.default_timeout * 1000000)
+        self._kill_timeout_ns = int(kill_timeout * 1000000000)
+        self._batch_size = batch_size
+        self._prefetched_tasks = deque()
         self._status = Status.STOPPED
 
+        if _HAS_FORK_HOOKS and not Worker._fork_hooks_registered:
+            # the hooks apply to every fork of the process, so they keep the state of gc unchanged
+            os.register_at_fork(
+                before=_disable_gc_before_fork,
+                after_in_parent=_restore_gc_after_fork_in_parent,
+                after_in_child=_restore_gc_after_fork_in_child
+            )
+            Worker._fork_hooks_registered = True
+
     def run(self):  # pragma: no cover
         """Runs the worker."""
         raise NotImplementedError
@@ -45,6 +140,63 @@ class Worker(object):
         self._status = Status.STOPPING
         logger.debug('Stopping %s %d.', self.__class__.__name__, os.getpid())
 
+    def _fork(self):
+        """Forks a child process with gc disabled.
+
+        Returns:
+            int: The pid of the child process, or 0 in the child process.
+        """
+        if _HAS_FORK_HOOKS:  # gc has been disabled by the fork hooks
+            return os.fork()
+
+        _disable_gc_before_fork()
+        pid = -1
+        try:
+            pid = os.fork()
+        finally:
+            if pid == 0:
+                _restore_gc_after_fork_in_child()
+            else:
+                _restore_gc_after_fork_in_parent()
+        return pid
+
+    def _get_timeout_ns(self, task):
+        """Gets the timeout in nanoseconds of a task.
+
+        Args:
+            task (delayed.task.Task): The task to be run.
+
+        Returns:
+            int: The timeout in nanoseconds.
+        """
+        if task.timeout:
+            return int(task.timeout * 1000000)
+        return self._default_timeout_ns
+
+    def _dequeue(self, block=True):
+        """Dequeues a task from the prefetched tasks, or from the queue if there is no prefetched task.
+
+        Args:
+            block (bool): Whether to wait for at most 1 second if the queue is empty.
+
+        Returns:
+            delayed.task.Task or None: The dequeued task, or None if the queue is empty.
+        """
+        tasks = self._prefetched_tasks
+        if not tasks:
+            if self._batch_size <= 1:
+                return self._queue.dequeue(block)
+            tasks.extend(self._queue.dequeue_batch(self._batch_size, block))
+            if not tasks:
+                return
+        return tasks.popleft()
+
+    def _requeue_prefetched_tasks(self):
+        """Requeues the prefetched tasks which haven't been run."""
+        tasks = self._prefetched_tasks
+        while tasks:
+            self._requeue_task(tasks.popleft())
+
     def _requeue_task(self, task):
         """Requeues a task.
 
@@ -83,10 +235,10 @@ class Worker(object):
 class ForkedWorker(Worker):
     """ForkedWorker forks a worker process for each task."""
 
-    __slots__ = ['_waker', '_child_pid']
+    __slots__ = ['_waker', '_poller', '_child_pid']
 
     def run(self):
-        logger.debug('Starting ForkedWorker %d.', os.getpid())
+        logger.debug('Starting %s %d.', self.__class__.__name__, os.getpid())
         self._status = Status.RUNNING
         self._register_signals()
 
@@ -94,7 +246,7 @@ class ForkedWorker(Worker):
             count = 0
             while self._status == Status.RUNNING:
                 try:
-                    task = self._queue.dequeue()
+                    task = self._dequeue()
                 except Exception:  # pragma: no cover
                     logger.exception('Dequeue task failed.')
                     count += 1
@@ -102,38 +254,53 @@ class ForkedWorker(Worker):
                 else:
                     count = 0
                     if task:
-                        gc.disable()  # https://bugs.python.org/issue1336
                         try:
-                            pid = os.fork()
+                            pid = self._start_child(task)
                         except OSError:  # pragma: no cover
-                            gc.enable()
-                            logger.exception('Fork task worker failed.')
+                            logger.exception('Start task worker failed.')
                         else:
-                            gc.enable()
-                            if pid == 0:  # child worker
-                                self._run_task(task)  # pragma: no cover
-                            else:  # monitor
-                                logger.debug('Forked a child worker %d.', pid)
-                                self._child_pid = pid
-                                self._monitor_task(task)
-                                self._child_pid = None
+                            if log.DEBUG_ENABLED:
+                                logger.debug('Started a child worker %d.', pid)
+                            self._child_pid = pid
+                            self._monitor_task(task)
+                            self._child_pid = None
         finally:
+            self._requeue_prefetched_tasks()
             self._unregister_signals()
             self._status = Status.STOPPED
-            logger.debug('Stopped ForkedWorker %d.', os.getpid())
+            logger.debug('Stopped %s %d.', self.__class__.__name__, os.getpid())
+
+    def _start_child(self, task):
+        """Starts a child worker to run the task.
+
+        Args:
+            task (delayed.task.Task): The task to be run.
+
+        Returns:
+            int: The pid of the child worker.
+        """
+        pid = self._fork()
+        if pid == 0:  # child worker
+            self._run_task(task)  # pragma: no cover
+        return pid
 
     def _register_signals(self):
         super(ForkedWorker, self)._register_signals()
         signal.signal(signal.SIGCHLD, ignore_signal)
 
-        self._waker = _, w = non_blocking_pipe()
+        # An eventfd can't be the wakeup fd: Python writes 1 byte per signal, but an eventfd only accepts
+        # 8-byte writes, and the signal numbers written to the pipe are needed by drain_signals().
+        self._waker = r, w = non_blocking_pipe()
         signal.set_wakeup_fd(w)
+        self._poller = Poller()
+        self._poller.register(r)
         self._child_pid = None
 
     def _unregister_signals(self):
         signal.set_wakeup_fd(-1)
-        os.close(self._waker[0])
-        os.close(self._waker[1])
+        self._poller.close()
+        del self._poller
+        close_fds(self._waker)
         del self._waker
 
         signal.signal(signal.SIGCHLD, signal.SIG_DFL)
@@ -145,22 +312,19 @@ class ForkedWorker(Worker):
         Args:
             task (delayed.task.Task): The task to be monitored.
         """
-        now = time.time()
-        if task.timeout:
-            deadline = now + task.timeout / 1000
-        else:
-            deadline = now + self._queue.default_timeout / 1000
-        kill_deadline = deadline + self._kill_timeout
+        now = monotonic_ns()
+        deadline = now + self._get_timeout_ns(task)
+        kill_deadline = deadline + self._kill_timeout_ns
         r = self._waker[0]
-        rlist = (r,)
+        poll = self._poller.poll
+        poll_timeout = _get_poll_timeout(now, deadline, kill_deadline, False)
         killing = False
         pid = self._child_pid
 
         try:
             while True:
-                readable_fds, _, _ = select_ignore_eintr(rlist, (), (), 0.1)
-                if readable_fds:
-                    drain_out(r)
+                # only the waker has been registered, call waitpid() only if it caught SIGCHLD
+                if poll(poll_timeout) and drain_signals(r) & _CHILD_SIGNALS:
                     p, exit_status = wait_pid_ignore_eintr(pid, os.WNOHANG)
                     if p != 0:
                         if exit_status:
@@ -173,13 +337,14 @@ class ForkedWorker(Worker):
                                 return
                         break
 
-                now = time.time()
+                now = monotonic_ns()
                 if now >= deadline:
                     if now >= kill_deadline:
                         os.kill(pid, signal.SIGKILL)
                     elif not killing:
                         os.kill(pid, signal.SIGTERM)
                         killing = True
+                poll_timeout = _get_poll_timeout(now, deadline, kill_deadline, killing)
         except Exception:  # pragma: no cover
             logger.exception('Monitor task %d error.', task.id)
             if task.error_handler_path:
@@ -216,13 +381,97 @@ class ForkedWorker(Worker):
             os._exit(exit_code)
 
 
+class SpawnedWorker(ForkedWorker):
+    """SpawnedWorker spawns a new Python interpreter by `os.posix_spawn()` for each task.
+    It's cheaper than forking a large process, but the child process has to import the task function and
+    its dependencies for each task, and it won't inherit the states of the worker (eg: the logging handlers,
+    the child process only logs the warnings and errors to stderr instead).
+    It requires Python 3.8+.
+
+    Args:
+        queue (delayed.queue.Queue): The task queue of the worker.
+        kill_timeout (int or float): The kill timeout in seconds of the worker.
+            If the worker not exited in `kill_timeout` seconds, the monitor will send SIGKILL
+            to the worker.
+        batch_size (int): The max count of the tasks to be dequeued in one round trip.
+
+    Raises:
+        RuntimeError: If `os.posix_spawn()` is not available.
+    """
+
+    __slots__ = ['_argv', '_env']
+
+    def __init__(self, queue, kill_timeout=5, batch_size=1):
+        if not _HAS_POSIX_SPAWN:
+            raise RuntimeError('SpawnedWorker requires os.posix_spawn()')
+        super(SpawnedWorker, self).__init__(queue, kill_timeout, batch_size)
+        self._argv = [sys.executable, '-m', 'delayed._runner']
+
+    def run(self):
+        # the task function should be imported from the same paths as the worker
+        self._env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        super(SpawnedWorker, self).run()
+
+    def _start_child(self, task):
+        """Spawns a child worker and sends the task to it through a pipe.
+
+        Args:
+            task (delayed.task.Task): The task to be run.
+
+        Returns:
+            int: The pid of the child worker.
+        """
+        task_reader, task_writer = os.pipe()
+        try:
+            try:
+                os.set_inheritable(task_reader, True)
+                pid = os.posix_spawn(sys.executable, self._argv + [str(task_reader)], self._env)
+            finally:
+                os.close(task_reader)
+
+            set_non_blocking(task_writer)
+            self._send_task(task, pid, task_writer)
+        finally:
+            os.close(task_writer)
+        return pid
+
+    def _send_task(self, task, pid, task_writer):
+        """Sends the task to the spawned child worker.
+        If the task cannot be fully sent before its deadline, the child worker will be killed,
+        and the monitor will handle it as a timed out task.
+
+        Args:
+            task (delayed.task.Task): The task to be sent.
+            pid (int): The pid of the child worker.
+            task_writer (int): The non-blocking write end of the task channel.
+        """
+        data, error_no = try_write(task_writer, memoryview(task.data))
+        if error_no == errno.EAGAIN:  # the task is larger than the pipe capacity, wait until the child reads it
+            deadline = monotonic_ns() + self._get_timeout_ns(task)
+            # the signals should be left to the monitor
+            poller = Poller()
+            poller.register(task_writer, EVENT_WRITE)
+            try:
+                while error_no == errno.EAGAIN:
+                    if monotonic_ns() >= deadline:  # maybe the child worker is not working
+                        logger.error('Sending task to worker %d timeout.', pid)
+                        os.kill(pid, signal.SIGKILL)
+                        return
+                    if poller.poll(0.1):
+                        data, error_no = try_write(task_writer, data)
+            finally:
+                poller.close()
+        if error_no:  # the monitor will requeue the task
+            logger.error('The task channel to worker %d is broken.', pid)
+
+
 class PreforkedWorker(Worker):
     """PreforkedWorker forks a worker process and reuses it for each task.
     If a task runs out of time, the forked worker process will be killed by the monitor, then a new
     worker process will be forked for subsequent tasks.
     """
 
-    __slots__ = ['_waker', '_task_channel', '_result_channel', '_child_pid']
+    __slots__ = ['_waker', '_poller', '_task_channel', '_result_channel', '_child_pid', '_header', '_gc_frozen']
 
     def run(self):
         logger.debug('Starting PreforkedWorker %d.', os.getpid())
@@ -233,7 +482,7 @@ class PreforkedWorker(Worker):
             count = 0
             while self._status == Status.RUNNING:
                 try:
-                    task = self._queue.dequeue()
+                    task = self._dequeue()
                 except Exception:  # pragma: no cover
                     logger.exception('Dequeue task failed.')
                     count += 1
@@ -245,14 +494,15 @@ class PreforkedWorker(Worker):
                             self._task_channel = non_blocking_pipe()
                             self._result_channel = non_blocking_pipe()
 
-                            gc.disable()  # https://bugs.python.org/issue1336
                             try:
-                                pid = os.fork()
+                                pid = self._fork()
                             except OSError:  # pragma: no cover
-                                gc.enable()
                                 logger.exception('Fork task worker failed.')
+                                for fd in self._task_channel + self._result_channel:
+                                    os.close(fd)
+                                self._requeue_task(task)
+                                continue
                             else:
-                                gc.enable()
                                 if pid == 0:  # child
                                     self._run_tasks()  # pragma: no cover
                                 else:  # monitor
@@ -261,51 +511,69 @@ class PreforkedWorker(Worker):
 
                                     os.close(self._task_channel[0])
                                     os.close(self._result_channel[1])
+                                    self._poller.register(self._result_channel[0])
 
                         self._monitor_task(task)
 
                         if not self._child_pid:
                             os.close(self._task_channel[1])
+                            self._poller.unregister(self._result_channel[0])
                             os.close(self._result_channel[0])
         finally:
+            self._requeue_prefetched_tasks()
             self._unregister_signals()
             self._status = Status.STOPPED
             logger.debug('Stopped PreforkedWorker %d.', os.getpid())
 
+    def _fork(self):
+        if _HAS_GC_FREEZE and not self._gc_frozen:
+            # Moves all the existing objects to the permanent generation before forking the first
+            # long-running child, so that collecting garbage in the children won't unshare their
+            # copy-on-write pages. It's done only once per run, or the objects created by the monitor
+            # between the forks would never be collected.
+            gc.freeze()
+            self._gc_frozen = True
+        return super(PreforkedWorker, self)._fork()
+
     def _register_signals(self):
         super(PreforkedWorker, self)._register_signals()
         signal.signal(signal.SIGCHLD, ignore_signal)
 
         self._waker = r, w = non_blocking_pipe()
+        self._poller = Poller()
+        self._poller.register(r)
         self._child_pid = None
+        self._header = bytearray(4)  # the length prefix of the task data, reused for each task
+        self._gc_frozen = False
 
         signal.set_wakeup_fd(w)
 
     def _unregister_signals(self):
         signal.set_wakeup_fd(-1)
 
-        os.close(self._waker[0])
-        os.close(self._waker[1])
+        self._poller.close()
+        del self._poller
+        close_fds(self._waker)
         del self._waker
 
         signal.signal(signal.SIGCHLD, signal.SIG_DFL)
         super(PreforkedWorker, self)._unregister_signals()
 
+        if self._gc_frozen:  # the frozen objects should be collectable after the worker stopped
+            gc.unfreeze()
+            self._gc_frozen = False
+
     def _monitor_task(self, task):
         """Monitors the task.
 
         Args:
             task (delayed.task.Task): The task to be monitored.
         """
-        now = time.time()
-        if task.timeout:
-            timeout = task.timeout / 1000
-        else:
-            timeout = self._queue.default_timeout / 1000
+        now = monotonic_ns()
+        timeout = self._get_timeout_ns(task)
         deadline = now + timeout
-        kill_deadline = deadline + self._kill_timeout
+        kill_deadline = deadline + self._kill_timeout_ns
         waker_reader = self._waker[0]
-        result_reader = self._result_channel[0]
         killing = False
         pid = self._child_pid
 
@@ -313,16 +581,18 @@ class PreforkedWorker(Worker):
             self._rerun_task(task)
             return
 
-        rlist = (waker_reader, result_reader)
+        poll = self._poller.poll
+        poll_timeout = _get_poll_timeout(monotonic_ns(), deadline, kill_deadline, False)
         try:
             while True:
-                readable_fds, _, _ = select_ignore_eintr(rlist, (), (), 0.1)
-                if readable_fds:
+                events = poll(poll_timeout)
+                if events:
                     done = False
 
-                    for fd in readable_fds:
+                    for fd, _ in events:
                         if fd == waker_reader:  # catch a signal (maybe SIGCHLD)
-                            drain_out(waker_reader)
+                            if not drain_signals(waker_reader) & _CHILD_SIGNALS:
+                                continue
                             p, exit_status = wait_pid_ignore_eintr(pid, os.WNOHANG)
                             if p != 0:  # child has exited
                                 logger.warning('The child worker %d has exited.', p)
@@ -337,8 +607,8 @@ class PreforkedWorker(Worker):
                                         return
                                 done = True
                                 break
-                        else:  # fd == result_reader, task has finished
-                            if drain_out(fd):  # task has finished
+                        else:  # fd is the result reader, task has finished
+                            if drain_out(fd, SMALL_BUF_SIZE):  # task has finished
                                 done = True
                                 break
                             # else child has exited abnormally
@@ -346,13 +616,14 @@ class PreforkedWorker(Worker):
                     if done:
                         break
 
-                now = time.time()
+                now = monotonic_ns()
                 if now >= deadline:
                     if now >= kill_deadline:
                         os.kill(pid, signal.SIGKILL)
                     elif not killing:
                         os.kill(pid, signal.SIGTERM)
                         killing = True
+                poll_timeout = _get_poll_timeout(now, deadline, kill_deadline, killing)
         except Exception:  # pragma: no cover
             logger.exception('Monitor task %d error.', task.id)
             if task.error_handler_path:
@@ -365,17 +636,18 @@ class PreforkedWorker(Worker):
 
         Args:
             task (delayed.task.Task): The task to be monitored.
-            start_time (int or float): The start timestamp of the task.
-            timeout (int or float): The timeout in seconds of the task.
+            start_time (int): The start time in nanoseconds of the task, read from `monotonic_ns()`.
+            timeout (int): The timeout in nanoseconds of the task.
 
         Returns:
             bool: Whether the task has been sent successfully.
         """
         task_writer = self._task_channel[1]
         data_len = len(task.data)
-        data = struct.pack('=I', data_len) + task.data
-        if len(data) <= BUF_SIZE:  # it won't be blocked
-            error_no = try_write(task_writer, data)[1]
+        struct.pack_into('=I', self._header, 0, data_len)
+        buffers = [self._header, task.data]
+        if data_len + 4 <= BUF_SIZE:  # it won't be blocked
+            error_no = try_writev(task_writer, buffers)[1]
             if error_no:
                 if error_no == errno.EAGAIN:  # pragma: no cover
                     logger.warning(
@@ -387,27 +659,43 @@ class PreforkedWorker(Worker):
                     logger.error('The task channel to worker %d is broken.', self._child_pid)
                 return False
         else:
-            send_timeout = timeout * 0.5  # assume the rest 50% time is not enough for the task
-            send_deadline = start_time + send_timeout
-            wlist = (task_writer,)
-            while True:
-                _, writable_fds, _ = select_ignore_eintr((), wlist, (), 0.1)
-                if writable_fds:
-                    data, error_no = try_write(task_writer, data)
-                    if error_no == 0:  # task has been fully written
-                        break
+            send_deadline = self._get_send_deadline(start_time, timeout)
+            # the task writer is only watched while sending a large task,
+            # and the signals should be left to the monitor
+            poller = Poller()
+            poller.register(task_writer, EVENT_WRITE)
+            try:
+                while True:
+                    if poller.poll(0.1):
+                        buffers, error_no = try_writev(task_writer, buffers)
+                        if error_no == 0:  # task has been fully written
+                            break
 
-                    if error_no != errno.EAGAIN:
-                        logger.error('The task channel to worker %d is broken.', self._child_pid)
-                        return False
+                        if error_no != errno.EAGAIN:
+                            logger.error('The task channel to worker %d is broken.', self._child_pid)
+                            return False
 
-                    # else not fully written, wait until writable
+                        # else not fully written, wait until writable
 
-                if time.time() > send_deadline:  # sending timeout, maybe the child worker is not working
-                    logger.error('Sending task to worker %d timeout.', self._child_pid)
-                    return False
+                    if monotonic_ns() > send_deadline:  # sending timeout, maybe the child worker is not working
+                        logger.error('Sending task to worker %d timeout.', self._child_pid)
+                        return False
+            finally:
+                poller.close()
         return True
 
+    def _get_send_deadline(self, start_time, timeout):
+        """Gets the deadline to send a large task.
+
+        Args:
+            start_time (int): The start time in nanoseconds of the task.
+            timeout (int): The timeout in nanoseconds of the task.
+
+        Returns:
+            int: The deadline in nanoseconds.
+        """
+        return start_time + timeout // 2  # assume the rest 50% time is not enough for the task
+
     def _rerun_task(self, task):
         """Kills its child worker and requeues the task.
 
@@ -416,23 +704,30 @@ class PreforkedWorker(Worker):
         """
         os.kill(self._child_pid, signal.SIGKILL)
         wait_pid_ignore_eintr(self._child_pid, 0)
+        self._child_pid = None
         self._requeue_task(task)
 
+    def _get_monitor_fds(self):
+        """Gets the fds owned by the monitor, which should be closed in the child worker.
+
+        Returns:
+            list(int): The fds of the monitor.
+        """
+        return [self._task_channel[1], self._result_channel[0], self._waker[0], self._waker[1]]
+
     def _run_tasks(self):
         """Runs tasks.
         The monitor sends the tasks to the worker through a pipe.
         """
         exit_code = 1
         try:
-            task_writer = self._task_channel[1]
-            os.close(task_writer)
-
-            result_reader, result_writer = self._result_channel
-            os.close(result_reader)
+            result_writer = self._result_channel[1]
 
+            # only closes the fds of the monitor, the others (eg: the redis connections) may be used by the tasks
             signal.set_wakeup_fd(-1)
-            os.close(self._waker[0])
-            os.close(self._waker[1])
+            self._poller.close()
+            del self._poller
+            close_fds(self._get_monitor_fds())
             del self._waker
 
             signal.signal(signal.SIGCHLD, signal.SIG_DFL)
@@ -482,39 +777,343 @@ class PreforkedWorker(Worker):
         """Receives a task from its monitor.
 
         Returns:
-            bytes or None: The task data.
+            bytes or memoryview or None: The task data.
         """
         task_reader = self._task_channel[0]
         result_writer = self._result_channel[1]
         rlist = (task_reader,)
 
         select_ignore_eintr(rlist, (), ())
-        logger.debug('The task channel became readable.')
+        if log.DEBUG_ENABLED:
+            logger.debug('The task channel became readable.')
 
         head_data = read1(task_reader)
-        if not head_data or len(head_data) <= 4:
+        if not head_data:
+            logger.debug('The task channel has been closed.')
+            return
+        if len(head_data) <= 4:
             logger.error('The task channel is broken.')
             write_byte(result_writer, b'1')
             return
 
         data_length = struct.unpack('=I', head_data[:4])[0]
-        task_data = head_data[4:]
-        read_length = len(task_data)
-        rest_length = data_length - read_length
-        if rest_length:
-            buf = BytesIO(task_data)
-            buf.seek(0, os.SEEK_END)
-            while rest_length:
-                select_ignore_eintr(rlist, (), ())
+        read_length = len(head_data) - 4
+        if read_length == data_length:
+            return head_data[4:]
+
+        buf = bytearray(data_length)
+        view = memoryview(buf)
+        view[:read_length] = memoryview(head_data)[4:]
+        while read_length < data_length:
+            select_ignore_eintr(rlist, (), ())
+            if log.DEBUG_ENABLED:
                 logger.debug('The task channel became readable.')
-                length = read_bytes(task_reader, rest_length, buf)
-                if length == 0:
+            length = read_into(task_reader, view[read_length:])
+            if length == 0:
+                logger.error('The task channel is broken.')
+                write_byte(result_writer, b'1')
+                return
+            read_length += length
+        return view
+
+
+class _ChildWorker(object):
+    """_ChildWorker records the state of a child worker process of the `PreforkedWorkerPool`."""
+
+    __slots__ = ['pid', 'task_channel', 'result_channel', 'task', 'deadline', 'kill_deadline', 'killing']
+
+    def __init__(self):
+        self.pid = None
+        self.task_channel = None
+        self.result_channel = None
+        self.task = None
+        self.deadline = None
+        self.kill_deadline = None
+        self.killing = False
+
+
+class PreforkedWorkerPool(PreforkedWorker):
+    """PreforkedWorkerPool forks `num_workers` worker processes up front and dispatches tasks to the idle
+    ones, so that several tasks can run concurrently without forking a process for each task.
+    If a task runs out of time, its worker process will be killed by the monitor, then a new worker
+    process will be forked for subsequent tasks.
+
+    Args:
+        queue (delayed.queue.Queue): The task queue of the worker.
+        kill_timeout (int or float): The kill timeout in seconds of the worker.
+        num_workers (int or None): The number of the worker processes.
+            None means the number of CPUs.
+        batch_size (int): The max count of the tasks to be dequeued in one round trip.
+    """
+
+    __slots__ = ['_num_workers', '_children']
+
+    def __init__(self, queue, kill_timeout=5, num_workers=None, batch_size=1):
+        super(PreforkedWorkerPool, self).__init__(queue, kill_timeout, batch_size)
+        self._num_workers = num_workers or multiprocessing.cpu_count()
+        self._children = []
+
+    def run(self):
+        logger.debug('Starting PreforkedWorkerPool %d.', os.getpid())
+        self._status = Status.RUNNING
+        self._register_signals()
+
+        try:
+            self._children = [_ChildWorker() for _ in range(self._num_workers)]
+            for child in self._children:
+                self._fork_child(child)
+
+            count = 0
+            retry_at = 0  # the time in nanoseconds to retry dequeuing after a failure
+            while True:
+                busy = self._is_busy()
+                if self._status == Status.RUNNING:
+                    child = self._idle_child()
+                    if child:
+                        now = monotonic_ns()
+                        if now < retry_at:  # keeps monitoring the running tasks before retrying
+                            timeout = min((retry_at - now) / 1000000000.0, _MAX_POLL_TIMEOUT)
+                        else:
+                            # blocks in Redis only if no busy child worker needs to be checked meanwhile,
+                            # so that a new task can be dispatched as soon as it has been enqueued
+                            block = not busy or self._get_nearest_deadline() - now >= _DEQUEUE_TIMEOUT_NS
+                            try:
+                                task = self._dequeue(block)
+                            except Exception:  # pragma: no cover
+                                logger.exception('Dequeue task failed.')
+                                count += 1
+                                if not busy:
+                                    time.sleep(retry_time(count))
+                                    continue
+                                retry_at = monotonic_ns() + int(retry_time(count) * 1000000000)
+                                timeout = _MAX_POLL_TIMEOUT
+                            else:
+                                count = 0
+                                if task:
+                                    self._dispatch_task(child, task)
+                                    timeout = 0  # try to dispatch more tasks
+                                elif block:  # dequeue() has been blocked for a while
+                                    timeout = 0
+                                else:  # a busy child worker will reach its deadline soon
+                                    timeout = _MAX_POLL_TIMEOUT
+                    else:
+                        timeout = _MAX_POLL_TIMEOUT
+                elif busy:  # waits for the running tasks
+                    timeout = _MAX_POLL_TIMEOUT
+                else:
                     break
-                if length == rest_length:
-                    logger.error('The task channel is broken.')
-                    write_byte(result_writer, b'1')
-                    return
-                rest_length = length
-            task_data = buf.getvalue()
-            buf.close()
-        return task_data
+                self._monitor_tasks(timeout)
+        finally:
+            self._requeue_prefetched_tasks()
+            self._stop_children()
+            self._unregister_signals()
+            self._status = Status.STOPPED
+            logger.debug('Stopped PreforkedWorkerPool %d.', os.getpid())
+
+    def _idle_child(self):
+        """Finds an idle child worker.
+
+        Returns:
+            _ChildWorker or None: The idle child worker, or None if all the child workers are busy.
+        """
+        for child in self._children:
+            if child.task is None:
+                return child
+
+    def _is_busy(self):
+        """Returns whether any child worker is running a task."""
+        for child in self._children:
+            if child.task is not None:
+                return True
+        return False
+
+    def _get_nearest_deadline(self):
+        """Returns the nearest deadline in nanoseconds of the busy child workers to be checked.
+        It's the kill deadline if the child worker is being terminated.
+        """
+        nearest_deadline = None
+        for child in self._children:
+            if child.task:
+                deadline = child.kill_deadline if child.killing else child.deadline
+                if nearest_deadline is None or deadline < nearest_deadline:
+                    nearest_deadline = deadline
+        return nearest_deadline
+
+    def _switch_to(self, child):
+        """Points the channels of the worker to a child worker, so that the methods of `PreforkedWorker`
+        can be reused.
+
+        Args:
+            child (_ChildWorker): The child worker to be switched to.
+        """
+        self._child_pid = child.pid
+        self._task_channel = child.task_channel
+        self._result_channel = child.result_channel
+
+    def _fork_child(self, child):
+        """Forks a child worker process.
+
+        Args:
+            child (_ChildWorker): The child worker to be forked.
+
+        Returns:
+            bool: Whether the child worker process has been forked successfully.
+        """
+        child.task_channel = non_blocking_pipe()
+        child.result_channel = non_blocking_pipe()
+
+        try:
+            pid = self._fork()
+        except OSError:  # pragma: no cover
+            logger.exception('Fork task worker failed.')
+            for fd in child.task_channel + child.result_channel:
+                os.close(fd)
+            child.task_channel = child.result_channel = None
+            return False
+
+        if pid == 0:  # child
+            self._switch_to(child)  # pragma: no cover
+            self._run_tasks()  # pragma: no cover
+
+        logger.debug('Forked a child worker %d.', pid)
+        child.pid = pid
+        os.close(child.task_channel[0])
+        os.close(child.result_channel[1])
+        self._poller.register(child.result_channel[0])
+        return True
+
+    def _get_monitor_fds(self):
+        fds = super(PreforkedWorkerPool, self)._get_monitor_fds()
+        for sibling in self._children:
+            if sibling.pid:  # the pid of the current child worker hasn't been set in its own process
+                fds.append(sibling.task_channel[1])
+                fds.append(sibling.result_channel[0])
+        return fds
+
+    def _close_child(self, child):
+        """Closes the channels of an exited child worker.
+
+        Args:
+            child (_ChildWorker): The exited child worker.
+        """
+        os.close(child.task_channel[1])
+        self._poller.unregister(child.result_channel[0])
+        os.close(child.result_channel[0])
+        child.pid = child.task_channel = child.result_channel = child.task = None
+
+    def _get_send_deadline(self, start_time, timeout):
+        # the other busy child workers can't be monitored while sending a task
+        send_deadline = super(PreforkedWorkerPool, self)._get_send_deadline(start_time, timeout)
+        for child in self._children:
+            if child.task:
+                deadline = child.kill_deadline if child.killing else child.deadline
+                if start_time < deadline < send_deadline:  # SIGKILL has been sent if its kill deadline passed
+                    send_deadline = deadline
+        return send_deadline
+
+    def _dispatch_task(self, child, task):
+        """Sends a task to an idle child worker.
+
+        Args:
+            child (_ChildWorker): The idle child worker.
+            task (delayed.task.Task): The task to be dispatched.
+        """
+        if not child.pid and not self._fork_child(child):  # pragma: no cover
+            self._requeue_task(task)
+            return
+
+        now = monotonic_ns()
+        timeout = self._get_timeout_ns(task)
+
+        self._switch_to(child)
+        if not self._send_task(task, now, timeout):
+            self._rerun_task(task)
+            self._close_child(child)
+            return
+
+        child.task = task
+        child.deadline = now + timeout
+        child.kill_deadline = child.deadline + self._kill_timeout_ns
+        child.killing = False
+
+    def _monitor_tasks(self, timeout):
+        """Monitors the tasks of the busy child workers.
+
+        Args:
+            timeout (int or float): The max timeout in seconds to wait for the child workers.
+                It will be shortened to wake up in time to kill the child workers.
+        """
+        if timeout:
+            now = monotonic_ns()
+            for child in self._children:
+                if child.task:
+                    timeout = min(timeout, _get_poll_timeout(now, child.deadline, child.kill_deadline, child.killing))
+        events = self._poller.poll(timeout)
+        if events:
+            waker_reader = self._waker[0]
+            children = dict((child.result_channel[0], child) for child in self._children if child.pid)
+            caught_signal = False
+            for fd, _ in events:
+                if fd == waker_reader:
+                    caught_signal = True
+                else:
+                    child = children[fd]
+                    if drain_out(fd, SMALL_BUF_SIZE) and child.task:  # task has finished
+                        self._release_task(child.task)
+                        child.task = None
+                    # else child has exited abnormally
+            if caught_signal and drain_signals(waker_reader) & _CHILD_SIGNALS:  # catch SIGCHLD
+                self._reap_children()
+
+        now = monotonic_ns()
+        for child in self._children:
+            if child.task and now >= child.deadline:
+                if now >= child.kill_deadline:
+                    os.kill(child.pid, signal.SIGKILL)
+                elif not child.killing:
+                    os.kill(child.pid, signal.SIGTERM)
+                    child.killing = True
+
+    def _reap_children(self):
+        """Reaps the exited child workers and handles their unfinished tasks.
+        Only the child workers of the pool are waited, the other child processes are left to their owners.
+        """
+        for child in self._children:
+            if not child.pid:
+                continue
+            pid, exit_status = wait_pid_ignore_eintr(child.pid, os.WNOHANG)
+            if pid == 0:
+                continue
+
+            logger.warning('The child worker %d has exited.', pid)
+            task = child.task
+            self._close_child(child)
+            if task:
+                if exit_status:
+                    kill_signal = exit_status & SIGNAL_MASK
+                    if kill_signal:
+                        if task.error_handler_path:
+                            task.handle_error(kill_signal, None)
+                    else:  # task hasn't been run
+                        self._requeue_task(task)
+                        continue
+                self._release_task(task)
+
+    def _stop_children(self):
+        """Stops the child workers by closing their task channels, then waits for them.
+        The idle child workers will exit soon. The busy ones only exist if the monitor stops abnormally,
+        they are killed since their tasks can't be monitored anymore.
+        """
+        for child in self._children:
+            if child.pid:
+                pid = child.pid
+                task = child.task
+                self._close_child(child)
+                if task:
+                    os.kill(pid, signal.SIGKILL)
+                wait_pid_ignore_eintr(pid, 0)
+                if task:
+                    if task.error_handler_path:
+                        task.handle_error(signal.SIGKILL, None)
+                    self._release_task(task)
+        self._children = []
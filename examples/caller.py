@@ -10,6 +10,7 @@ DELAY(func1)(1, 2, x=3)
 
 func2(1, 2, x=3)
 func2.delay(1, 2, x=3)
+func2.delay_many([(1, 2), (3, 4)])
 
 DELAY_WITH_PARAMS(timeout=0.1, error_handler=error_handler)(func1)(1, 2, x=3)
 
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from delayed.logger import setup_logger
+from delayed.worker import PreforkedWorkerPool
+
+from .client import queue
+
+
+setup_logger()
+
+worker = PreforkedWorkerPool(queue=queue)
+worker.run()
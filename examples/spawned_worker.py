@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+from delayed.logger import setup_logger
+from delayed.worker import SpawnedWorker
+
+from .client import queue
+
+
+setup_logger()
+
+worker = SpawnedWorker(queue=queue)
+worker.run()
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import functools
+
+import pytest
+
 from delayed.delay import delay_with_params, delayed
 from .common import CONN, DELAY, error_handler, func, QUEUE, QUEUE_NAME
 
@@ -18,11 +22,31 @@ def delayed_func_with_params(a, b):
     return a + b
 
 
+@DELAYED()
+def delayed_func_with_defaults(a, b=2):
+    return a + b
+
+
+def inject_first_arg(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(1, *args, **kwargs)
+    return wrapper
+
+
+@DELAYED()
+@inject_first_arg
+def delayed_wrapped_func(a, b):
+    return a + b
+
+
 def test_delayed():
     CONN.delete(QUEUE_NAME)
 
     assert delayed_func(1, 2) == 3
     assert delayed_func.__name__ == 'delayed_func'
+    # the delay() with the same params is generated on Python 3.5+, otherwise it accepts `*args` and `**kwargs`
+    generated = delayed_func.delay.__code__.co_argcount == 2
 
     delayed_func.delay(1, 2)
     assert QUEUE.len() == 1
@@ -30,10 +54,54 @@ def test_delayed():
     assert task.run() == 3
     QUEUE.release(task)
 
+    delayed_func.delay(1, b=2)
+    assert QUEUE.len() == 1
+    task = QUEUE.dequeue()
+    if generated:
+        assert task.args == (1, 2)
+        assert task.kwargs == {}
+    else:
+        assert task.args == (1,)
+        assert task.kwargs == {'b': 2}
+    assert task.run() == 3
+    QUEUE.release(task)
+
+    if generated:  # the args are checked by the generated delay()
+        with pytest.raises(TypeError):
+            delayed_func.delay(1)
+        assert QUEUE.len() == 0
+
+    delayed_func_with_defaults.delay(1)
+    assert QUEUE.len() == 1
+    task = QUEUE.dequeue()
+    assert task.args == (1,)
+    assert task.run() == 3
+    QUEUE.release(task)
+
+    delayed_wrapped_func.delay(2)  # the params of the wrapper should be accepted
+    assert QUEUE.len() == 1
+    task = QUEUE.dequeue()
+    assert task.args == (2,)
+    assert task.run() == 3
+    QUEUE.release(task)
+
     delayed_func_with_params.delay(1, 2)
     assert QUEUE.len() == 1
     task = QUEUE.dequeue()
+    assert task.func_path == 'tests.test_delay:delayed_func_with_params'
+    assert task.timeout == 5000
+    assert task.prior
+    assert task.error_handler_path == 'tests.common:error_handler'
+    assert task.run() == 3
+    QUEUE.release(task)
+
+    delayed_func_with_params.delay_many([(1, 2), (3, 4)])
+    assert QUEUE.len() == 2
+    task = QUEUE.dequeue()
     assert task.timeout == 5000
+    assert task.run() == 7
+    QUEUE.release(task)
+    task = QUEUE.dequeue()
     assert task.run() == 3
     QUEUE.release(task)
 
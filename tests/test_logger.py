@@ -2,7 +2,8 @@
 
 import logging
 
-from delayed.logger import logger, set_handler, setup_logger
+import delayed.logger
+from delayed.logger import logger, refresh_debug_flag, set_handler, setup_logger
 
 
 def test_logger():
@@ -24,3 +25,38 @@ def test_logger():
     set_handler(handler)
     assert len(logger.handlers) == 1
     assert logger.handlers[0] is handler
+
+
+def test_setup_logger_with_level():
+    handlers = logger.handlers
+
+    logger.handlers = [delayed.logger._null_handler]
+    setup_logger(level=logging.WARNING)
+    assert len(logger.handlers) == 1
+    assert logger.handlers[0].level == logging.WARNING
+    assert not delayed.logger.DEBUG_ENABLED
+
+    logger.handlers = handlers
+    refresh_debug_flag()
+
+
+def test_refresh_debug_flag():
+    handlers = logger.handlers
+
+    set_handler(logging.NullHandler())
+    assert not delayed.logger.DEBUG_ENABLED
+
+    handler = logging.StreamHandler()
+    set_handler(handler)
+    assert delayed.logger.DEBUG_ENABLED
+
+    handler.setLevel(logging.INFO)
+    refresh_debug_flag()
+    assert not delayed.logger.DEBUG_ENABLED
+
+    logger.addHandler(logging.StreamHandler())
+    refresh_debug_flag()
+    assert delayed.logger.DEBUG_ENABLED
+
+    logger.handlers = handlers
+    refresh_debug_flag()
@@ -25,10 +25,31 @@ class TestQueue(object):
         assert CONN.zcard(ENQUEUED_KEY) == 2
         CONN.delete(QUEUE_NAME, NOTI_KEY, ENQUEUED_KEY)
 
+    def test_enqueue_many(self):
+        CONN.delete(QUEUE_NAME, NOTI_KEY, ENQUEUED_KEY)
+
+        QUEUE.enqueue_many([])
+        assert CONN.llen(QUEUE_NAME) == 0
+
+        task1 = Task.create(func, (1, 2))
+        task2 = Task.create(func, (3, 4), timeout=10)
+        task3 = Task.create(func, (5, 6), prior=True)
+        QUEUE.enqueue_many([task1, task2, task3])
+        assert task1.id > 0
+        assert task2.id == task1.id + 1
+        assert task3.id == task1.id + 2
+        assert CONN.llen(QUEUE_NAME) == 3
+        assert CONN.llen(NOTI_KEY) == 3
+        assert CONN.zcard(ENQUEUED_KEY) == 3
+        assert CONN.lrange(QUEUE_NAME, 0, -1) == [task3.data, task1.data, task2.data]
+        assert CONN.zscore(ENQUEUED_KEY, task2.data) == 10000 + QUEUE._requeue_timeout
+        CONN.delete(QUEUE_NAME, NOTI_KEY, ENQUEUED_KEY)
+
     def test_dequeue(self):
         CONN.delete(QUEUE_NAME, NOTI_KEY, DEQUEUED_KEY, ENQUEUED_KEY)
 
         assert QUEUE.dequeue() is None
+        assert QUEUE.dequeue(block=False) is None
 
         task1 = Task.create(func, (1, 2))
         task2 = Task.create(func, (3,), {'b': 4})
@@ -78,6 +99,35 @@ class TestQueue(object):
 
         CONN.delete(DEQUEUED_KEY, ENQUEUED_KEY)
 
+    def test_dequeue_batch(self):
+        CONN.delete(QUEUE_NAME, NOTI_KEY, DEQUEUED_KEY, ENQUEUED_KEY)
+
+        assert QUEUE.dequeue_batch(2) == []
+        assert QUEUE.dequeue_batch(2, block=False) == []
+
+        task1 = Task.create(func, (1, 2), timeout=10)
+        task2 = Task.create(func, (3, 4), timeout=20)
+        task3 = Task.create(func, (5, 6))
+        QUEUE.enqueue_many([task1, task2, task3])
+
+        tasks = QUEUE.dequeue_batch(2)
+        assert [task.id for task in tasks] == [task1.id, task2.id]
+        assert tasks[0].args == (1, 2)
+        assert CONN.llen(QUEUE_NAME) == 1
+        assert CONN.llen(NOTI_KEY) == 1
+        assert CONN.zcard(ENQUEUED_KEY) == 3
+        assert CONN.zcard(DEQUEUED_KEY) == 2
+        # the timeouts are accumulated, the difference is the timeout and the requeue timeout of task2
+        assert CONN.zscore(DEQUEUED_KEY, tasks[1].data) - CONN.zscore(DEQUEUED_KEY, tasks[0].data) == 20000 + 10000
+
+        tasks = QUEUE.dequeue_batch(2, block=False)
+        assert [task.id for task in tasks] == [task3.id]
+        assert CONN.llen(QUEUE_NAME) == 0
+        assert CONN.llen(NOTI_KEY) == 0
+        assert CONN.zcard(DEQUEUED_KEY) == 3
+
+        CONN.delete(DEQUEUED_KEY, ENQUEUED_KEY)
+
     def test_requeue(self):
         CONN.delete(QUEUE_NAME, NOTI_KEY, DEQUEUED_KEY, ENQUEUED_KEY)
 
@@ -94,7 +144,7 @@ class TestQueue(object):
         assert not QUEUE.requeue(task)
         assert CONN.zcard(DEQUEUED_KEY) == 1
 
-        task._data = data
+        task._data = memoryview(bytearray(data))
         assert QUEUE.requeue(task)
         assert CONN.zcard(DEQUEUED_KEY) == 0
 
@@ -129,6 +179,37 @@ class TestQueue(object):
         assert CONN.zcard(ENQUEUED_KEY) == 0
         assert CONN.zcard(DEQUEUED_KEY) == 0
 
+        # the task received by a child worker
+        task = Task.create(func, (1, 2))
+        QUEUE.enqueue(task)
+        task = Task.deserialize(memoryview(bytearray(QUEUE.dequeue().data)))
+        QUEUE.release(task)
+        assert CONN.zcard(ENQUEUED_KEY) == 0
+        assert CONN.zcard(DEQUEUED_KEY) == 0
+
+    def test_enqueue_received_task(self):
+        CONN.delete(QUEUE_NAME, NOTI_KEY, DEQUEUED_KEY, ENQUEUED_KEY)
+
+        task = Task.create(func, (1, 2))
+        QUEUE.enqueue(task)
+        # the task received by a child worker, and retried by its error handler
+        task = Task.deserialize(memoryview(bytearray(QUEUE.dequeue().data)))
+        QUEUE.release(task)
+        QUEUE.enqueue(task)
+        assert QUEUE.len() == 1
+        task = QUEUE.dequeue()
+        assert task.run() == 3
+        QUEUE.release(task)
+
+        task = Task.deserialize(memoryview(bytearray(task.data)))
+        QUEUE.enqueue_many([task])
+        assert QUEUE.len() == 1
+        task = QUEUE.dequeue()
+        assert task.run() == 3
+        QUEUE.release(task)
+        assert CONN.zcard(ENQUEUED_KEY) == 0
+        assert CONN.zcard(DEQUEUED_KEY) == 0
+
     def test_len(self):
         CONN.delete(QUEUE_NAME)
 
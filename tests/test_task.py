@@ -22,6 +22,20 @@ class TestTask(object):
         assert task.prior
         assert task.error_handler_path == 'tests.common:error_handler'
 
+    def test_factory(self):
+        create = Task.factory(func, timeout=10, prior=True, error_handler=error_handler)
+        task1 = create((1, 2), None)
+        task2 = create((3,), {'b': 4})
+        assert task1 is not task2
+        assert task1.func_path == task2.func_path == 'tests.common:func'
+        assert task1.args == (1, 2)
+        assert task1.kwargs == {}
+        assert task2.args == (3,)
+        assert task2.kwargs == {'b': 4}
+        assert task1.timeout == task2.timeout == 10000
+        assert task1.prior and task2.prior
+        assert task1.error_handler_path == task2.error_handler_path == 'tests.common:error_handler'
+
     def test_serialize_and_deserialize(self):
         task = Task.create(func, (1, 2))
         data = task.serialize()
@@ -56,6 +70,15 @@ class TestTask(object):
         assert task.prior
         assert task.error_handler_path == 'tests.common:error_handler'
 
+        task = Task.create(func, (1, 2))
+        data = memoryview(bytearray(task.serialize()))
+        task = Task.deserialize(data)
+        assert task.data is data
+        assert task.func_path == 'tests.common:func'
+        assert task.args == (1, 2)
+        assert task.serialize() == data
+        assert isinstance(task.serialize(), bytes)
+
     def test_run(self):
         task = Task.create(func, (1, 2))
         data = task.serialize()
@@ -1,10 +1,38 @@
 # -*- coding: utf-8 -*-
 
-import io
+import errno
+import fcntl
 import os
 
 import delayed.utils
-from delayed.utils import drain_out, non_blocking_pipe, read_bytes, retry_time
+from delayed.constants import BUF_SIZE
+from delayed.utils import (close_fds, drain_out, drain_signals, EVENT_READ, EVENT_WRITE, monotonic_ns,
+                           non_blocking_pipe, Poller, read_into, retry_time, try_writev)
+
+
+def test_close_fds():
+    r1, w1 = os.pipe()
+    r2, w2 = os.pipe()
+    r3, w3 = os.pipe()
+    close_fds([w3, r1, w1, r3, r2])
+    for fd in (r1, w1, r2, r3, w3):
+        try:
+            os.fstat(fd)
+        except OSError as e:
+            assert e.errno == errno.EBADF
+        else:  # pragma: no cover
+            assert False
+    os.fstat(w2)
+    os.close(w2)
+
+
+def test_non_blocking_pipe():
+    r, w = non_blocking_pipe()
+    for fd in (r, w):
+        assert fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_NONBLOCK
+        assert fcntl.fcntl(fd, fcntl.F_GETFD) & fcntl.FD_CLOEXEC
+    os.close(r)
+    os.close(w)
 
 
 def test_drain_out():
@@ -17,25 +45,90 @@ def test_drain_out():
     os.close(r)
     delayed.utils.BUF_SIZE = buf_size
 
+    r, w = non_blocking_pipe()
+    os.write(w, b'1' * 100)
+    assert drain_out(r, 10)
+    assert not drain_out(r, 10)
+    os.close(w)
+    os.close(r)
+
 
-def test_read_bytes():
+def test_drain_signals():
     r, w = non_blocking_pipe()
-    buf = io.BytesIO()
+    os.write(w, bytearray((1, 17, 1)))
+    assert drain_signals(r) == {1, 17}
+    assert drain_signals(r) == set()
+    os.write(w, bytearray(range(1, 101)))
+    assert drain_signals(r) == set(range(1, 101))
+    os.close(w)
+    os.close(r)
+
+
+def test_read_into():
+    r, w = non_blocking_pipe()
+    buf = bytearray(10)
+    view = memoryview(buf)
 
     os.write(w, b'1')
-    assert read_bytes(r, 10, buf) == 9
-    assert buf.getvalue() == b'1'
-    assert read_bytes(r, 9, buf) == 9
-    assert buf.getvalue() == b'1'
+    assert read_into(r, view) == 1
+    assert buf == b'1' + b'\0' * 9
+    assert read_into(r, view[1:]) == 0
 
-    os.write(w, b'1' * 9)
-    assert read_bytes(r, 9, buf) == 0
-    assert buf.getvalue() == b'1' * 10
+    os.write(w, b'2' * 20)
+    assert read_into(r, view[1:]) == 9
+    assert buf == b'1' + b'2' * 9
+    assert os.read(r, 20) == b'2' * 11
 
     os.close(w)
+    assert read_into(r, view) == 0
     os.close(r)
 
 
+def test_poller():
+    r, w = non_blocking_pipe()
+    poller = Poller()
+    poller.register(r)
+    assert poller.poll(0) == []
+
+    os.write(w, b'1')
+    assert poller.poll(0) == [(r, EVENT_READ)]
+    assert poller.poll() == [(r, EVENT_READ)]
+    drain_out(r)
+
+    poller.register(w, EVENT_WRITE)
+    assert poller.poll(0) == [(w, EVENT_WRITE)]
+    poller.unregister(w)
+    assert poller.poll(0) == []
+
+    poller.close()
+    os.close(r)
+    os.close(w)
+
+
+def test_try_writev():
+    r, w = non_blocking_pipe()
+
+    assert try_writev(w, [b'12', bytearray(b''), b'345']) == ([], 0)
+    assert os.read(r, 10) == b'12345'
+
+    buffers, error_no = try_writev(w, [b'1' * BUF_SIZE, b'2' * BUF_SIZE])
+    assert error_no == errno.EAGAIN
+    assert b''.join(bytes(buf) for buf in buffers) == b'2' * BUF_SIZE
+    drain_out(r)
+
+    os.close(r)
+    buffers, error_no = try_writev(w, [b'1'])
+    assert error_no == errno.EPIPE
+    assert len(buffers) == 1
+    os.close(w)
+
+
+def test_monotonic_ns():
+    t1 = monotonic_ns()
+    t2 = monotonic_ns()
+    assert t2 >= t1 > 0
+
+
 def test_retry_time():
     for _ in range(1000):
         assert 1 <= retry_time(1) <= 2
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import errno
+import gc
 import os
 import signal
 import struct
@@ -10,11 +11,13 @@ import time
 
 import pytest
 
-from delayed.constants import BUF_SIZE
+import delayed.worker
+from delayed.constants import BUF_SIZE, SIGNAL_MASK
 from delayed.delay import delay_with_params
 from delayed.task import Task
-from delayed.utils import non_blocking_pipe, select_ignore_eintr, try_write, wait_pid_ignore_eintr
-from delayed.worker import ForkedWorker, PreforkedWorker
+from delayed.utils import monotonic_ns, non_blocking_pipe, select_ignore_eintr, try_write, wait_pid_ignore_eintr
+from delayed.worker import (_ChildWorker, _get_poll_timeout, ForkedWorker, PreforkedWorker, PreforkedWorkerPool,
+                            SpawnedWorker)
 
 from .common import CONN, DELAY, DEQUEUED_KEY, ENQUEUED_KEY, func, NOTI_KEY, QUEUE, QUEUE_NAME
 
@@ -22,8 +25,10 @@ from .common import CONN, DELAY, DEQUEUED_KEY, ENQUEUED_KEY, func, NOTI_KEY, QUE
 TEST_STRING = b'test'
 ERROR_STRING = b'error'
 r = w = 0
+kill_signals = []
 
 close = os.close
+closerange = os.closerange
 
 
 def error_func(*args, **kwargs):
@@ -54,6 +59,10 @@ def error_handler5(task, kill_signal, exc_info):
     close(task.kwargs['task_writer'])
 
 
+def error_handler6(task, kill_signal, exc_info):
+    kill_signals.append(kill_signal)
+
+
 def wait(*args, **kwargs):
     os.write(w, b'1')
     time.sleep(10)
@@ -107,6 +116,76 @@ class TestWorker(object):
 
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
 
+    def test_run_with_batch_size(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        global r, w
+        r, w = os.pipe()
+        pid = os.getpid()
+
+        for worker in (ForkedWorker(QUEUE, batch_size=3), PreforkedWorker(QUEUE, batch_size=3)):
+            task1 = Task.create(task_func)
+            task2 = Task.create(stop, (pid,))
+            task3 = Task.create(task_func)
+            QUEUE.enqueue_many([task1, task2, task3])
+            worker.run()
+            assert os.read(r, 4) == TEST_STRING
+            # task3 has been prefetched but not run
+            assert QUEUE.len() == 1
+            assert QUEUE.dequeued_len() == 0
+            CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        os.close(r)
+        os.close(w)
+
+    def test_fork(self):
+        worker = ForkedWorker(QUEUE)
+        for enabled in (True, False):
+            if enabled:
+                gc.enable()
+            else:
+                gc.disable()
+            pid = worker._fork()
+            if pid == 0:  # pragma: no cover
+                os._exit(int(gc.isenabled() != enabled))
+            assert gc.isenabled() == enabled
+            _, exit_status = wait_pid_ignore_eintr(pid, 0)
+            assert exit_status == 0
+
+            pid = os.fork()  # the fork hooks apply to all the forks
+            if pid == 0:  # pragma: no cover
+                os._exit(int(gc.isenabled() != enabled))
+            assert gc.isenabled() == enabled
+            _, exit_status = wait_pid_ignore_eintr(pid, 0)
+            assert exit_status == 0
+        gc.enable()
+
+    def test_fork_concurrently(self):
+        gc.enable()
+        # 2 threads are forking at the same time
+        delayed.worker._disable_gc_before_fork()
+        delayed.worker._disable_gc_before_fork()
+        assert not gc.isenabled()
+        delayed.worker._restore_gc_after_fork_in_parent()
+        assert not gc.isenabled()  # the other thread is still forking
+        delayed.worker._restore_gc_after_fork_in_parent()
+        assert gc.isenabled()
+
+        gc.disable()
+        delayed.worker._disable_gc_before_fork()
+        delayed.worker._disable_gc_before_fork()
+        delayed.worker._restore_gc_after_fork_in_parent()
+        delayed.worker._restore_gc_after_fork_in_parent()
+        assert not gc.isenabled()
+        gc.enable()
+
+    def test_get_poll_timeout(self):
+        assert _get_poll_timeout(0, 10000000000, 15000000000, False) == 0.1
+        assert _get_poll_timeout(0, 50000000, 5050000000, False) == 0.05
+        assert _get_poll_timeout(0, 0, 5000000000, False) == 0.001
+        assert _get_poll_timeout(4990000000, 0, 5000000000, True) == 0.01
+        assert _get_poll_timeout(5000000000, 0, 5000000000, True) == 0.1
+
     def test_requeue_task(self, monkeypatch):
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
 
@@ -124,8 +203,15 @@ class TestWorker(object):
             else:
                 raise Exception('close error')
 
+        def _closerange(low, high):
+            if os.getpid() == pid:
+                closerange(low, high)
+            else:
+                raise Exception('close error')
+
         monkeypatch.setattr(os, '_exit', exit)
         monkeypatch.setattr(os, 'close', _close)
+        monkeypatch.setattr(os, 'closerange', _closerange)
 
         worker = ForkedWorker(QUEUE)
         task = Task.create(func, (1, 2))
@@ -246,6 +332,62 @@ class TestForkedWorker(object):
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
 
 
+@pytest.mark.skipif(not hasattr(os, 'posix_spawn'), reason='requires os.posix_spawn()')
+class TestSpawnedWorker(object):
+    def test_run(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        reader, writer = os.pipe()
+        os.set_inheritable(writer, True)
+        pid = os.getpid()
+
+        task = Task.create(os.write, (writer, TEST_STRING), timeout=10)
+        QUEUE.enqueue(task)
+        task = Task.create(func, (b'1' * BUF_SIZE * 2, b''))  # larger than the pipe capacity
+        QUEUE.enqueue(task)
+        task = Task.create(stop, (pid,))
+        QUEUE.enqueue(task)
+        worker = SpawnedWorker(QUEUE)
+        worker.run()
+        assert os.read(reader, 4) == TEST_STRING
+        assert CONN.zcard(DEQUEUED_KEY) == 0
+
+        os.close(reader)
+        os.close(writer)
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_term_worker(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        del kill_signals[:]
+        task = Task.create(time.sleep, (10,), timeout=0.01, error_handler=error_handler6)
+        QUEUE.enqueue(task)
+        task = Task.create(stop, (os.getpid(),))
+        QUEUE.enqueue(task)
+        worker = SpawnedWorker(QUEUE, kill_timeout=1)
+        worker.run()
+        assert kill_signals == [signal.SIGTERM]
+
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_send_task(self):
+        task = Task.create(func, (b'1' * BUF_SIZE * 2, b''), timeout=0.01)  # larger than the pipe capacity
+        task.serialize()
+        reader, writer = non_blocking_pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            time.sleep(10)  # never reads the task
+            os._exit(0)
+
+        worker = SpawnedWorker(QUEUE)
+        worker._send_task(task, pid, writer)
+        _, exit_status = wait_pid_ignore_eintr(pid, 0)
+        assert exit_status & SIGNAL_MASK == signal.SIGKILL
+
+        os.close(reader)
+        os.close(writer)
+
+
 class TestPreforkedWorker(object):
     def test_run(self):
         def kill_child():
@@ -288,14 +430,42 @@ class TestPreforkedWorker(object):
         os.close(w)
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
 
+    @pytest.mark.skipif(not hasattr(gc, 'freeze'), reason='gc.freeze() requires Python 3.7+')
+    def test_fork(self, monkeypatch):
+        freeze_count = [0]
+        unfreeze_count = [0]
+
+        def freeze():
+            freeze_count[0] += 1
+
+        def unfreeze():
+            unfreeze_count[0] += 1
+
+        monkeypatch.setattr(gc, 'freeze', freeze)
+        monkeypatch.setattr(gc, 'unfreeze', unfreeze)
+        worker = PreforkedWorker(QUEUE)
+        worker._register_signals()
+        for _ in range(2):
+            pid = worker._fork()
+            if pid == 0:  # pragma: no cover
+                os._exit(0)
+            assert wait_pid_ignore_eintr(pid, 0) == (pid, 0)
+        assert freeze_count[0] == 1
+        assert unfreeze_count[0] == 0
+
+        worker._unregister_signals()
+        assert unfreeze_count[0] == 1
+        assert not worker._gc_frozen
+
     def test_run_tasks(self, monkeypatch):
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
 
-        def noop(_):
+        def noop(*args):
             return
 
         monkeypatch.setattr(os, '_exit', noop)
         monkeypatch.setattr(os, 'close', noop)
+        monkeypatch.setattr(os, 'closerange', noop)
 
         global r, w
         r, w = os.pipe()
@@ -367,7 +537,7 @@ class TestPreforkedWorker(object):
             worker._run_tasks()
         else:
             worker._child_pid = pid
-            assert worker._send_task(task, time.time(), 10)
+            assert worker._send_task(task, monotonic_ns(), 10000000000)
             os.close(worker._result_channel[1])
             assert wait_pid_ignore_eintr(pid, 0) == (pid, 0)
             assert os.read(r, 4) == TEST_STRING
@@ -456,7 +626,7 @@ class TestPreforkedWorker(object):
         os.close(worker._result_channel[1])
         worker._child_pid = pid
         assert wait_pid_ignore_eintr(pid, 0) == (pid, 0)
-        assert not worker._send_task(task1, time.time(), 0.1)  # broken pipe
+        assert not worker._send_task(task1, monotonic_ns(), 100000000)  # broken pipe
 
         os.close(worker._task_channel[1])
         os.close(worker._result_channel[0])
@@ -475,7 +645,7 @@ class TestPreforkedWorker(object):
         os.close(worker._result_channel[1])
         worker._child_pid = pid
         assert wait_pid_ignore_eintr(pid, 0) == (pid, 0)
-        assert not worker._send_task(task2, time.time(), 0.1)  # broken pipe
+        assert not worker._send_task(task2, monotonic_ns(), 100000000)  # broken pipe
 
         os.close(worker._task_channel[1])
         os.close(worker._result_channel[0])
@@ -522,11 +692,11 @@ class TestPreforkedWorker(object):
 
             rlist = (result_reader,)
             worker._child_pid = p
-            assert worker._send_task(task1, time.time(), 10)
+            assert worker._send_task(task1, monotonic_ns(), 10000000000)
             select_ignore_eintr(rlist, (), ())
             os.read(result_reader, 1)
 
-            assert worker._send_task(task2, time.time(), 10)
+            assert worker._send_task(task2, monotonic_ns(), 10000000000)
             select_ignore_eintr(rlist, (), ())
             os.read(result_reader, 1)
 
@@ -582,3 +752,210 @@ class TestPreforkedWorker(object):
         os.close(worker._result_channel[0])
         worker._unregister_signals()
         CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+
+class TestPreforkedWorkerPool(object):
+    def test_run(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        global r, w
+        pid = os.getpid()
+        r, w = os.pipe()
+
+        task = Task.create(task_func)
+        QUEUE.enqueue(task)
+        task = Task.create(task_func, timeout=100)
+        QUEUE.enqueue(task)
+        task = Task.create(stop, (pid,))
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, num_workers=2)
+        worker.run()
+        assert os.read(r, 8) == TEST_STRING * 2
+        assert worker._children == []
+
+        task = Task.create(error_func, (pid,), error_handler=error_handler)
+        QUEUE.enqueue(task)
+        worker.run()
+        assert os.read(r, 5) == ERROR_STRING
+
+        task = Task.create(task_func3)
+        QUEUE.enqueue(task)
+        task = Task.create(stop, (pid,))
+        QUEUE.enqueue(task)
+        worker.run()
+        assert os.read(r, 4) == TEST_STRING
+
+        os.close(r)
+        os.close(w)
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_term_worker(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        global r, w
+        r, w = os.pipe()
+
+        task = Task.create(wait, (os.getpid(),), timeout=0.01, error_handler=error_handler3)
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, kill_timeout=0.1, num_workers=2)
+        worker.run()
+
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_kill_worker(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+        task = Task.create(wait, (os.getpid(),), timeout=0.01, error_handler=error_handler4)
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, kill_timeout=0.1, num_workers=2)
+        worker.run()
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_reap_children(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        other_pid = os.fork()
+        if other_pid == 0:  # a child process not owned by the pool
+            time.sleep(0.1)
+            os._exit(3)
+
+        task = Task.create(time.sleep, (0.3,))
+        QUEUE.enqueue(task)
+        task = Task.create(stop, (os.getpid(),))
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, num_workers=2)
+        worker.run()
+
+        pid, exit_status = wait_pid_ignore_eintr(other_pid, 0)
+        assert pid == other_pid
+        assert os.WEXITSTATUS(exit_status) == 3
+
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_stop_busy_children(self):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        del kill_signals[:]
+        task = Task.create(time.sleep, (10,), error_handler=error_handler6)
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, num_workers=1)
+        worker._register_signals()
+        child = _ChildWorker()
+        worker._children = [child]
+        worker._fork_child(child)
+        worker._dispatch_task(child, QUEUE.dequeue())
+        assert QUEUE.dequeued_len() == 1
+
+        start_time = time.time()
+        worker._stop_children()
+        worker._unregister_signals()
+        assert time.time() - start_time < 5
+        assert kill_signals == [signal.SIGKILL]
+        assert QUEUE.dequeued_len() == 0
+
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_get_send_deadline(self):
+        worker = PreforkedWorkerPool(QUEUE, num_workers=3)
+        idle_child, busy_child, killing_child = worker._children = [_ChildWorker() for _ in range(3)]
+        assert worker._get_send_deadline(0, 10000) == 5000
+
+        busy_child.task = killing_child.task = Task.create(func)
+        busy_child.deadline = 3000
+        busy_child.kill_deadline = 8000
+        killing_child.killing = True
+        killing_child.deadline = 0
+        killing_child.kill_deadline = 4000
+        assert worker._get_send_deadline(0, 10000) == 3000
+
+        busy_child.task = None
+        assert worker._get_send_deadline(0, 10000) == 4000
+        assert worker._get_send_deadline(4000, 10000) == 9000  # SIGKILL has been sent
+
+    def test_get_nearest_deadline(self):
+        worker = PreforkedWorkerPool(QUEUE, num_workers=3)
+        idle_child, busy_child, killing_child = worker._children = [_ChildWorker() for _ in range(3)]
+        assert worker._get_nearest_deadline() is None
+
+        busy_child.task = killing_child.task = Task.create(func)
+        busy_child.deadline = 3000
+        busy_child.kill_deadline = 8000
+        killing_child.killing = True
+        killing_child.deadline = 0
+        killing_child.kill_deadline = 4000
+        assert worker._get_nearest_deadline() == 3000
+
+        busy_child.task = None
+        assert worker._get_nearest_deadline() == 4000
+
+    def test_dispatch_while_busy(self, monkeypatch):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        dequeue = PreforkedWorkerPool._dequeue
+        busy_blocks = []
+
+        def _dequeue(self, block=True):
+            if self._is_busy():
+                busy_blocks.append(block)
+            return dequeue(self, block)
+
+        def enqueue():
+            time.sleep(0.3)
+            start_time[0] = time.time()
+            QUEUE.enqueue(Task.create(task_func))
+            assert os.read(r, 4) == TEST_STRING
+            end_time[0] = time.time()
+            QUEUE.enqueue(Task.create(stop, (pid,)))
+
+        monkeypatch.setattr(PreforkedWorkerPool, '_dequeue', _dequeue)
+
+        global r, w
+        r, w = os.pipe()
+        pid = os.getpid()
+        start_time = [0]
+        end_time = [0]
+
+        task = Task.create(time.sleep, (1,), timeout=100)  # keeps a child worker busy with a far deadline
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, num_workers=2)
+        thread = threading.Thread(target=enqueue)
+        thread.start()
+        worker.run()
+        thread.join()
+
+        assert busy_blocks and all(busy_blocks)  # blocks in Redis while the task is running
+        assert end_time[0] - start_time[0] < 0.05
+
+        os.close(r)
+        os.close(w)
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+    def test_monitor_while_retrying(self, monkeypatch):
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)
+
+        dequeue = PreforkedWorkerPool._dequeue
+
+        def _dequeue(self, block=True):
+            if self._is_busy():
+                raise Exception('dequeue error')
+            return dequeue(self, block)
+
+        monkeypatch.setattr(PreforkedWorkerPool, '_dequeue', _dequeue)
+        monkeypatch.setattr(delayed.worker, 'retry_time', lambda count: 1)
+
+        global r, w
+        r, w = os.pipe()
+
+        # the task should be terminated in time while the pool is waiting to retry dequeuing
+        task = Task.create(wait, (os.getpid(),), timeout=0.01, error_handler=error_handler3)
+        QUEUE.enqueue(task)
+        worker = PreforkedWorkerPool(QUEUE, kill_timeout=0.5, num_workers=2)
+        worker.run()
+
+        os.close(r)
+        os.close(w)
+        CONN.delete(QUEUE_NAME, ENQUEUED_KEY, DEQUEUED_KEY, NOTI_KEY)